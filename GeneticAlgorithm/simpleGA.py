@@ -28,19 +28,71 @@ configuration:
                   geneChoice:          Set from where to choose a gene, ex: "0123456789abcdef"
                   chromosomeMin:       Min number of genes in a chromosome
                   chromosomeMax:       Max number of genes in a chromosome
+                                       (dict and ragged: every chromosome has its own length,
+                                       array and packed: one length for the whole population)
                   populationMin:       Min number of chromosomes in population
                   populationMax:       Max number of chromosomes in population
-                  selectionType:       {roulette_wheel, truncation, rank}
-                  crossoverType:       {onepoint, twopoint}
+                  selectionType:       {roulette, truncation, rank, tournament}
+                  truncationRate:      Fraction of the best individuals chosen by truncation selection, ex: 0.5
+                  tournamentSize:      Individuals competing in every tournament selection
+                  crossoverType:       {onepoint, twopoint, uniform}
                   crossoverMin:        Min number of crossovers
                   crossoverMax:        Max number of crossovers
                   mutationType:        {flipbit, boundary, uniform}
                   mutationGeneRate:    Mutation probability of every gene, ex: 0.1 is 10%
-                  reductionType:       {surlvivalChildren, roulette}
-                  evaluationType:      {chromosome, population, individual}
+                  reductionType:       {surlvivalChildren, roulette, steadyState}
+                                       steadyState: every child replaces the worst individual when it is better,
+                                       the population is updated in place (use small crossoverMin/Max)
+                  evaluationType:      {chromosome, population, individual, parallel, batch, async}
+                                       batch: evaluationFunction gets a 2D array of chromosomes and returns a 1D fitness array
+                                       (ragged engine and dict engine with chromosomeMin < chromosomeMax:
+                                       gets the flat genes and the offsets arrays)
+                                       async: evaluationFunction is a coroutine function of a chromosome,
+                                       the population is evaluated concurrently in an event loop
                   evaluationFunction:  Function from other file
-                  stopType:            {generation, fitness, time}
-                  stopValue:           Number of generations or fitness
+                  evaluationWorkers:   Processes used by parallel evaluation, None: one per cpu
+                  evaluationChunk:     Chromosomes sent to a process at once, 0: split evenly between processes
+                  evaluationConcurrency: async: max evaluations awaited at the same time
+                  evaluationTimeout:   async: seconds an evaluation can last before it is retried, None: no limit
+                  evaluationRetries:   async: times a failed or timed out evaluation is tried again before raising
+                  cacheSize:           Max chromosomes whose fitness is remembered (least recently used go first), 0: no cache
+                  surrogateType:       {None, knn, linear}  model of the fitness that discards children before their
+                                       evaluation (array and packed engines)
+                  surrogateRate:       Fraction of the children evaluated, the ones with the best predicted fitness
+                  surrogateSize:       Last evaluated chromosomes the model learns from
+                  surrogateNeighbours: knn: chromosomes averaged by a prediction
+                  surrogateMin:        Evaluated chromosomes needed before children are discarded
+                  stopType:            {generation, fitness, time, stagnation} or a list of them, stops on the first reached
+                  stopValue:           Number of generations, fitness, seconds or generations without improvement
+                                       (a list paired with stopType when it is a list)
+                  engine:              {dict, array, packed}  dict: list of individuals, array: 2D genes + 1D fitness
+                                       packed: array with 0/1 genes packed in bits and other integer genes
+                                       in the smallest integer type (uint8 for small alphabets),
+                                       evaluation functions get the genes unpacked in that type (0/1 genes as uint8)
+                                       ragged: variable length chromosomes, 1D flat genes + offsets,
+                                       genes of chromosome i are genes[offsets[i]:offsets[i + 1]]
+                  packedChunk:         packed: chromosomes unpacked at once to be evaluated, bounds the memory
+                                       of the unpacked genes
+                  checkpointInterval:  Saves a checkpoint every checkpointInterval generations, 0: never
+                  checkpointPath:      File of the automatic checkpoints (.npz)
+                  profile:             True: get_statistics adds the seconds of every phase and the evaluations
+                  diversitySample:     Individuals sampled for the diversity of get_statistics, 0: no diversity
+                                       (counts every symbol of every column of the sample, opt-in)
+                  telemetryPath:       File where the statistics, best individual and phase seconds of
+                                       initialize and every generation are written by a background thread,
+                                       None: no telemetry
+                  telemetryFormat:     {jsonl, csv}
+                  telemetryInterval:   Seconds between flushes of the telemetry file
+                  telemetryQueue:      Generations waiting to be written, more are dropped instead of waiting
+                  seed:                Seed of the random generator of the Algorithm, None: from the system
+
+random:           Every random draw comes from a numpy Generator (rng argument of the functions),
+                  Algorithm owns one and Algorithm.spawn gives independent ones for processes and islands
+
+callbacks:        Algorithm.add_callback(event, function)
+                  on_generation_start: function(algorithm)
+                  on_phase_end:        function(algorithm, phase, seconds)
+                  on_generation_end:   function(algorithm)
 
 styles: 
                   classes: OneOther
@@ -49,9 +101,22 @@ styles:
 
 '''
 
-import random           # randint - uniform - choice
-import logging          # Unused
+import logging          # module logger
 import functools        # for testing with reduce function only
+import itertools        # accumulate
+import bisect           # bisect_left
+import numpy            # array engine
+import concurrent.futures  # parallel evaluation
+import os               # cpu_count
+import collections      # OrderedDict
+import time             # perf_counter
+import heapq            # nlargest - nsmallest
+import contextlib       # contextmanager
+import json             # random state in checkpoints
+import asyncio          # async evaluation
+
+import simpleGA_statistics   # fitness statistics, diversity, running aggregates
+import simpleGA_telemetry    # telemetry writer
 
 
 
@@ -77,20 +142,176 @@ class CustomException(Exception):
 # GENERATORS
 # ------------------------------------------------------------------------------------------------------------
 
-def gene_generator(geneType, geneMin, geneMax, geneChoice, **rest):
+# Used by the functions when they are not given the rng of an Algorithm
+defaultGenerator = numpy.random.default_rng()
+
+
+def random_stream(draw, block=256):
+   '''   Endless values of draw(block): random values are drawn in blocks instead of one call each '''
+   while True:
+      yield from draw(block).tolist()
+
+
+def gene_generator(geneType, geneMin, geneMax, geneChoice, rng=defaultGenerator, **rest):
    '''   generates new random gene g /
             geneMin <= gene <= geneMax ^
             types: 'Z': Integer, 'R': Real, 'C': elemenent from a list
    '''
-   while True:
-      if (geneType == 'Z'):
-         yield random.randint(geneMin,geneMax)
-      elif (geneType == 'R'):
-         yield random.uniform(geneMin,geneMax)
-      elif (geneType == 'C'):
-         yield random.choice(geneChoice)
-      else:
-         raise CustomException("geneType not implemented")
+   low, high = gene_bounds(geneType, geneMin, geneMax, geneChoice)
+   if (geneType == 'R'):
+      stream = random_stream(lambda block: rng.uniform(low, high, block))
+   else:
+      stream = random_stream(lambda block: rng.integers(low, high, block, endpoint=True))
+
+   for gene in stream:
+      yield geneChoice[gene] if geneType == 'C' else gene
+
+
+def gene_generator_array(size, geneType, geneMin, geneMax, geneChoice, rng=defaultGenerator, **rest):
+   '''   generates an array of random genes with shape size
+            'C' genes are stored as the index of the element in geneChoice
+   '''
+   if (geneType == 'Z'):
+      return rng.integers(geneMin, geneMax, size, endpoint=True)
+   elif (geneType == 'R'):
+      return rng.uniform(geneMin, geneMax, size)
+   elif (geneType == 'C'):
+      return rng.integers(0, len(geneChoice), size)
+   else:
+      raise CustomException("geneType not implemented")
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# ARRAY ENCODING
+# ------------------------------------------------------------------------------------------------------------
+
+def decode_chromosome(genes, geneType, geneChoice, **rest):
+   ''' Array row to the chromosome list used by the dict engine '''
+   if (geneType == 'C'):
+      return [geneChoice[code] for code in genes]
+   return genes.tolist()
+
+
+def decode_genes(genes, geneType, geneChoice, **rest):
+   ''' Genes array with 'C' codes replaced by their element of geneChoice '''
+   if (geneType == 'C'):
+      return numpy.array(list(geneChoice))[genes]
+   return genes
+
+
+def decode_individual(genes, fitness, **rest):
+   return {"chromosome": decode_chromosome(genes, **rest), "fitness": fitness.item()}
+
+
+def decode_population(genes, fitness, **rest):
+   ''' Arrays to a list of individuals '''
+   return [decode_individual(genes[i], fitness[i], **rest) for i in range(len(genes))]
+
+
+def encode_genes(genes, geneType, geneChoice, **rest):
+   ''' Genes (list or list of lists) to an array, 'C' genes to their index in geneChoice '''
+   if (geneType == 'C'):
+      codes = {gene: code for code, gene in enumerate(geneChoice)}
+      return numpy.vectorize(codes.__getitem__, otypes=[numpy.int64])(numpy.array(genes, dtype=object))
+   return numpy.array(genes)
+
+
+def gene_bounds(geneType, geneMin, geneMax, geneChoice, **rest):
+   ''' Lowest and highest value of a gene as stored in the array engine '''
+   if (geneType in ('Z', 'R')):
+      return geneMin, geneMax
+   elif (geneType == 'C'):
+      return 0, len(geneChoice) - 1
+   else:
+      raise CustomException("geneType not implemented")
+
+
+def encode_population(population, **rest):
+   ''' List of individuals to a genes array and a fitness array '''
+   genes = encode_genes([individual["chromosome"] for individual in population], **rest)
+   fitness = numpy.array([individual["fitness"] for individual in population], dtype=float)
+   return genes, fitness
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# PACKED ENCODING
+# ------------------------------------------------------------------------------------------------------------
+
+def packed_bits(geneType, geneMin, geneMax, geneChoice, **rest):
+   ''' True when every gene is 0 or 1 and is stored as a single bit '''
+   return geneType != 'R' and gene_bounds(geneType, geneMin, geneMax, geneChoice) == (0, 1)
+
+
+def packed_dtype(geneType, geneMin, geneMax, geneChoice, **rest):
+   ''' Smallest integer type holding every gene, 'R' genes stay float '''
+   if (geneType == 'R'):
+      return numpy.dtype(float)
+   low, high = gene_bounds(geneType, geneMin, geneMax, geneChoice)
+   return numpy.promote_types(numpy.min_scalar_type(low), numpy.min_scalar_type(high))
+
+
+def pack_genes(genes, **rest):
+   '''   Genes array to the packed engine: 0/1 genes to rows of bits (8 genes a byte, zero padded),
+         other genes to packed_dtype
+   '''
+   if (packed_bits(**rest)):
+      return numpy.packbits(genes.astype(bool), axis=-1)
+   return genes.astype(packed_dtype(**rest))
+
+
+def unpack_genes(genes, chromosomeSize, **rest):
+   ''' Packed genes to one value per gene: 0/1 genes as uint8, other genes keep their packed_dtype '''
+   if (packed_bits(**rest)):
+      return numpy.unpackbits(genes, axis=-1, count=chromosomeSize)
+   return genes
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# RAGGED ENCODING
+# ------------------------------------------------------------------------------------------------------------
+
+def ragged_offsets(lengths):
+   ''' Offsets of chromosomes with the given lengths, one more than chromosomes '''
+   return numpy.concatenate(([0], numpy.cumsum(lengths, dtype=numpy.int64)))
+
+
+def ragged_indexes(starts, lengths):
+   ''' Flat indexes of the segments [start, start + length), one after another '''
+   ends = numpy.cumsum(lengths, dtype=numpy.int64)
+   size = ends[-1] if len(ends) else 0
+   return numpy.repeat(starts - ends + lengths, lengths) + numpy.arange(size)
+
+
+def ragged_take(genes, offsets, rows):
+   ''' Genes and offsets of the given chromosomes, in the given order '''
+   starts = offsets[rows]
+   lengths = offsets[rows + 1] - starts
+   return genes[ragged_indexes(starts, lengths)], ragged_offsets(lengths)
+
+
+def ragged_concatenate(genes, offsets, otherGenes, otherOffsets):
+   ''' Chromosomes of the first population followed by the ones of the other '''
+   return (numpy.concatenate((genes, otherGenes)),
+           numpy.concatenate((offsets, otherOffsets[1:] + offsets[-1])))
+
+
+def decode_ragged(genes, offsets, fitness, **rest):
+   ''' Ragged arrays to a list of individuals '''
+   return [decode_individual(genes[offsets[i]:offsets[i + 1]], fitness[i], **rest) for i in range(len(fitness))]
+
+
+def encode_ragged(population, **rest):
+   ''' List of individuals to genes, offsets and fitness arrays '''
+   genes = encode_genes([gene for individual in population for gene in individual["chromosome"]], **rest)
+   offsets = ragged_offsets([len(individual["chromosome"]) for individual in population])
+   fitness = numpy.array([individual["fitness"] for individual in population], dtype=float)
+   return genes, offsets, fitness
 
 
 # ------------------------------------------------------------------------------------------------------------
@@ -100,22 +321,53 @@ def gene_generator(geneType, geneMin, geneMax, geneChoice, **rest):
 # ------------------------------------------------------------------------------------------------------------
 
 def initialization(population, populationMin, populationMax, 
-                          chromosomeMin, chromosomeMax, **rest): 
+                          chromosomeMin, chromosomeMax, rng=defaultGenerator, **rest): 
    '''   Creates first random population /
             populationMin <= len(population) <= populationMax ^
             chromosomeMin <= len(chromosome) <= chromosomeMax
    '''
-   gg = gene_generator(**rest)
-   
-   populationSize = random.randint(populationMin, populationMax)
-   chromosomeSize = random.randint(chromosomeMin, chromosomeMax)
-   
-   for j in range (populationSize):
-      new_chromosome = list()
-      for k in range (chromosomeSize):
-         gene = next(gg)
-         new_chromosome.append(gene)
-      population.append(dict([('chromosome', new_chromosome),('fitness', 0)]))
+   genes, offsets = initialization_ragged(populationMin, populationMax, chromosomeMin, chromosomeMax, rng, **rest)
+   population.extend(decode_ragged(genes, offsets, numpy.zeros(len(offsets) - 1), **rest))
+
+
+def initialization_array(populationMin, populationMax, chromosomeMin, chromosomeMax, rng=defaultGenerator, **rest):
+   '''   Creates first random population as a genes array /
+            populationMin <= len(genes) <= populationMax ^
+            chromosomeMin <= genes.shape[1] <= chromosomeMax
+   '''
+   populationSize = rng.integers(populationMin, populationMax, endpoint=True)
+   chromosomeSize = rng.integers(chromosomeMin, chromosomeMax, endpoint=True)
+   return gene_generator_array((populationSize, chromosomeSize), rng=rng, **rest)
+
+
+def initialization_packed(populationMin, populationMax, chromosomeMin, chromosomeMax, geneType,
+                          rng=defaultGenerator, **rest):
+   '''   Creates first random population already packed, returns the genes and the chromosome size /
+            0/1 genes are drawn as random bytes with the padding bits set to 0,
+            other integer genes are drawn in packed_dtype
+   '''
+   populationSize = rng.integers(populationMin, populationMax, endpoint=True)
+   chromosomeSize = rng.integers(chromosomeMin, chromosomeMax, endpoint=True).item()
+   if (packed_bits(geneType, **rest)):
+      genes = rng.integers(0, 256, (populationSize, -(-chromosomeSize // 8)), dtype=numpy.uint8)
+      if (chromosomeSize % 8):
+         genes[:, -1] &= numpy.uint8(0xFF << (8 - chromosomeSize % 8) & 0xFF)
+      return genes, chromosomeSize
+   if (geneType == 'R'):
+      return gene_generator_array((populationSize, chromosomeSize), geneType, rng=rng, **rest), chromosomeSize
+   low, high = gene_bounds(geneType, **rest)
+   return rng.integers(low, high, (populationSize, chromosomeSize), dtype=packed_dtype(geneType, **rest),
+                       endpoint=True), chromosomeSize
+
+
+def initialization_ragged(populationMin, populationMax, chromosomeMin, chromosomeMax, rng=defaultGenerator, **rest):
+   '''   Creates first random population as flat genes and offsets arrays /
+            populationMin <= len(offsets) - 1 <= populationMax ^
+            chromosomeMin <= length of every chromosome <= chromosomeMax
+   '''
+   populationSize = rng.integers(populationMin, populationMax, endpoint=True)
+   offsets = ragged_offsets(rng.integers(chromosomeMin, chromosomeMax, populationSize, endpoint=True))
+   return gene_generator_array(offsets[-1], rng=rng, **rest), offsets
 
 
 # ------------------------------------------------------------------------------------------------------------
@@ -126,7 +378,7 @@ def initialization(population, populationMin, populationMax,
 
 def evaluation(population, evaluationType, **rest):
    '''   Evaluate chromosome's fitness based on evaluationType
-            evaluationType E {chromosome, population, individual}
+            evaluationType E {chromosome, population, individual, parallel, batch, async}
    '''
    if (evaluationType == "chromosome"):
       evaluation_chromosome(population, **rest)
@@ -134,6 +386,12 @@ def evaluation(population, evaluationType, **rest):
       evaluation_population(population, **rest)
    elif (evaluationType == "individual"):
       evaluation_individual(population, **rest)
+   elif (evaluationType == "parallel"):
+      evaluation_parallel(population, **rest)
+   elif (evaluationType == "batch"):
+      evaluation_batch(population, **rest)
+   elif (evaluationType == "async"):
+      evaluation_async(population, **rest)
    elif (evaluationType == "test"):
       evaluation_test(population, **rest)
    else:
@@ -160,6 +418,386 @@ def evaluation_individual(population, evaluationFunction, **rest):
       evaluationFunction(individual)
 
 
+def evaluation_parallel(population, evaluationFunction, evaluationWorkers, evaluationChunk, executor=None, **rest):
+   '''   Same as evaluation_chromosome spread over a process pool
+            evaluationFunction must be picklable (defined at module level)
+            executor: a running pool to reuse, a temporary one is created otherwise
+   '''
+   if (executor is None):
+      with concurrent.futures.ProcessPoolExecutor(max_workers=evaluationWorkers) as executor:
+         return evaluation_parallel(population, evaluationFunction, evaluationWorkers, evaluationChunk, executor)
+
+   chunk = evaluationChunk or parallel_chunk(len(population), evaluationWorkers)
+   chromosomes = [individual["chromosome"] for individual in population]
+   for individual, fitness in zip(population, executor.map(evaluationFunction, chromosomes, chunksize=chunk)):
+      individual["fitness"] = fitness
+
+
+def evaluation_batch(population, evaluationFunction, chromosomeMin, chromosomeMax, **rest):
+   '''   evaluationFunction gets every chromosome in one 2D array and returns the fitness array,
+         with chromosomeMin < chromosomeMax the lengths differ and it gets the flat genes and the
+         offsets arrays as in the ragged engine
+   '''
+   if (not population):
+      return
+   chromosomes = [individual["chromosome"] for individual in population]
+   if (chromosomeMin == chromosomeMax):
+      fitness = evaluationFunction(numpy.array(chromosomes))
+   else:
+      fitness = evaluationFunction(numpy.array([gene for chromosome in chromosomes for gene in chromosome]),
+                                   ragged_offsets([len(chromosome) for chromosome in chromosomes]))
+   for individual, value in zip(population, numpy.asarray(fitness).tolist()):
+      individual["fitness"] = value
+
+
+def evaluation_async(population, **rest):
+   '''   evaluationFunction is a coroutine function, every chromosome is evaluated concurrently '''
+   chromosomes = [individual["chromosome"] for individual in population]
+   for individual, fitness in zip(population, asyncio.run(evaluation_async_chromosomes(chromosomes, **rest))):
+      individual["fitness"] = fitness
+
+
+async def evaluation_async_chromosomes(chromosomes, evaluationFunction, evaluationConcurrency,
+                                       evaluationTimeout, evaluationRetries, **rest):
+   '''   Fitness list of the chromosomes, at most evaluationConcurrency evaluations are awaited at once /
+            every evaluation is tried 1 + evaluationRetries times when it raises or lasts more than evaluationTimeout
+   '''
+   semaphore = asyncio.Semaphore(evaluationConcurrency)
+
+   async def evaluate(chromosome):
+      async with semaphore:
+         for attempt in range(evaluationRetries + 1):
+            try:
+               return await asyncio.wait_for(evaluationFunction(chromosome), evaluationTimeout)
+            except Exception:
+               if (attempt == evaluationRetries):
+                  raise
+
+   return await asyncio.gather(*(evaluate(chromosome) for chromosome in chromosomes))
+
+
+def parallel_chunk(size, evaluationWorkers):
+   ''' Splits size chromosomes evenly between the processes '''
+   return max(1, -(-size // (evaluationWorkers or os.cpu_count())))
+
+
+def evaluation_array(genes, evaluationType, **rest):
+   '''   Returns the fitness array of a genes array based on evaluationType
+            evaluationType E {chromosome, population, individual, parallel, batch, async}
+   '''
+   if (evaluationType == "chromosome"):
+      return evaluation_chromosome_array(genes, **rest)
+   elif (evaluationType in ("population", "individual")):
+      return evaluation_dict_array(genes, evaluationType, **rest)
+   elif (evaluationType == "parallel"):
+      return evaluation_parallel_array(genes, **rest)
+   elif (evaluationType == "batch"):
+      return evaluation_batch_array(genes, **rest)
+   elif (evaluationType == "async"):
+      return evaluation_async_array(genes, **rest)
+   elif (evaluationType == "test"):
+      return evaluation_test_array(genes, **rest)
+   else:
+      raise CustomException("EvaluationType not implemented")
+
+
+def evaluation_test_array(genes, **rest):
+   '''   Same as evaluation_test as a product with the powers of 2 '''
+   return genes @ (2.0 ** numpy.arange(genes.shape[1] - 1, -1, -1))
+
+
+def evaluation_batch_array(genes, evaluationFunction, **rest):
+   return numpy.asarray(evaluationFunction(decode_genes(genes, **rest)), dtype=float)
+
+
+def evaluation_async_array(genes, **rest):
+   chromosomes = [decode_chromosome(row, **rest) for row in genes]
+   return numpy.array(asyncio.run(evaluation_async_chromosomes(chromosomes, **rest)), dtype=float)
+
+
+def evaluation_chromosome_array(genes, evaluationFunction, **rest):
+   fitness = (evaluationFunction(decode_chromosome(row, **rest)) for row in genes)
+   return numpy.fromiter(fitness, dtype=float, count=len(genes))
+
+
+def evaluation_parallel_array(genes, evaluationFunction, evaluationWorkers, evaluationChunk,
+                              geneType, geneChoice, executor=None, **rest):
+   '''   Same as evaluation_chromosome_array spread over a process pool
+            every process gets a contiguous block of rows and decodes it itself
+   '''
+   if (executor is None):
+      with concurrent.futures.ProcessPoolExecutor(max_workers=evaluationWorkers) as executor:
+         return evaluation_parallel_array(genes, evaluationFunction, evaluationWorkers, evaluationChunk,
+                                          geneType, geneChoice, executor)
+
+   chunk = evaluationChunk or parallel_chunk(len(genes), evaluationWorkers)
+   futures = [executor.submit(evaluation_chromosome_array, genes[i:i + chunk], evaluationFunction,
+                              geneType=geneType, geneChoice=geneChoice)
+              for i in range(0, len(genes), chunk)]
+   return numpy.concatenate([future.result() for future in futures] or [numpy.zeros(0)])
+
+
+def evaluation_ragged(genes, offsets, evaluationType, **rest):
+   '''   Returns the fitness array of a ragged population based on evaluationType,
+         batch gets the flat genes and the offsets, other types get the chromosomes as lists
+   '''
+   if (evaluationType == "batch"):
+      return evaluation_batch_ragged(genes, offsets, **rest)
+   elif (evaluationType == "test"):
+      return evaluation_test_ragged(genes, offsets, **rest)
+
+   population = decode_ragged(genes, offsets, numpy.zeros(len(offsets) - 1), **rest)
+   evaluation(population, evaluationType, **rest)
+   return numpy.array([individual["fitness"] for individual in population], dtype=float)
+
+
+def evaluation_test_ragged(genes, offsets, **rest):
+   '''   Same as evaluation_test: every gene by the power of 2 of its distance to the end of its chromosome '''
+   lengths = numpy.diff(offsets)
+   chromosomes = numpy.repeat(numpy.arange(len(lengths)), lengths)
+   powers = 2.0 ** (offsets[chromosomes + 1] - 1 - numpy.arange(len(genes)))
+   return numpy.bincount(chromosomes, weights=genes * powers, minlength=len(lengths))
+
+
+def evaluation_batch_ragged(genes, offsets, evaluationFunction, **rest):
+   return numpy.asarray(evaluationFunction(decode_genes(genes, **rest), offsets), dtype=float)
+
+
+def evaluation_dict_array(genes, evaluationType, **rest):
+   '''   Functions written for the dict engine get a list of individuals '''
+   population = decode_population(genes, numpy.zeros(len(genes)), **rest)
+   evaluation(population, evaluationType, **rest)
+   return numpy.array([individual["fitness"] for individual in population], dtype=float)
+
+
+class FitnessCache(object):
+   ''' Fitness of the last maxSize evaluated chromosomes, least recently used are evicted first '''
+
+   def __init__(self, maxSize):
+      self.maxSize = maxSize
+      self.table = collections.OrderedDict()
+      self.hits = 0
+      self.misses = 0
+
+   def get(self, key):
+      fitness = self.table.get(key)
+      if (fitness is None):
+         self.misses += 1
+      else:
+         self.hits += 1
+         self.table.move_to_end(key)
+      return fitness
+
+   def put(self, key, fitness):
+      self.table[key] = fitness
+      self.table.move_to_end(key)
+      if (len(self.table) > self.maxSize):
+         self.table.popitem(last=False)
+
+
+def evaluation_cached(population, cache, **rest):
+   '''   Evaluates only the chromosomes that are not in the cache, repeated ones only once '''
+   missing = dict()
+   for individual in population:
+      key = tuple(individual["chromosome"])
+      if (key in missing):
+         missing[key].append(individual)
+         cache.hits += 1
+         continue
+      fitness = cache.get(key)
+      if (fitness is None):
+         missing[key] = [individual]
+      else:
+         individual["fitness"] = fitness
+
+   evaluation([individuals[0] for individuals in missing.values()], **rest)
+
+   for key, individuals in missing.items():
+      cache.put(key, individuals[0]["fitness"])
+      for individual in individuals[1:]:
+         individual["fitness"] = individuals[0]["fitness"]
+
+
+def evaluation_cached_ragged(genes, offsets, cache, **rest):
+   '''   Same as evaluation_cached_array for a ragged population, chromosomes are keyed by their bytes '''
+   fitness = numpy.empty(len(offsets) - 1)
+   missing = dict()
+   for i in range(len(fitness)):
+      key = genes[offsets[i]:offsets[i + 1]].tobytes()
+      if (key in missing):
+         missing[key].append(i)
+         cache.hits += 1
+         continue
+      value = cache.get(key)
+      if (value is None):
+         missing[key] = [i]
+      else:
+         fitness[i] = value
+
+   if (missing):
+      rows = numpy.array([rows[0] for rows in missing.values()])
+      values = evaluation_ragged(*ragged_take(genes, offsets, rows), **rest)
+      for (key, rows), value in zip(missing.items(), values):
+         cache.put(key, value)
+         fitness[rows] = value
+   return fitness
+
+
+def evaluation_cached_array(genes, cache, **rest):
+   '''   Same as evaluation_cached for a genes array, rows are keyed by their bytes '''
+   fitness = numpy.empty(len(genes))
+   missing = dict()
+   for i, row in enumerate(genes):
+      key = row.tobytes()
+      if (key in missing):
+         missing[key].append(i)
+         cache.hits += 1
+         continue
+      value = cache.get(key)
+      if (value is None):
+         missing[key] = [i]
+      else:
+         fitness[i] = value
+
+   if (missing):
+      values = evaluation_array(genes[[rows[0] for rows in missing.values()]], **rest)
+      for (key, rows), value in zip(missing.items(), values):
+         cache.put(key, value)
+         fitness[rows] = value
+   return fitness
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# SURROGATE
+# ------------------------------------------------------------------------------------------------------------
+
+class Surrogate(object):
+   '''   Cheap model of the fitness learnt from the last surrogateSize evaluated chromosomes /
+            surrogateType E {knn, linear}
+            knn: mean fitness of the surrogateNeighbours nearest chromosomes (Hamming distance for 'C' genes)
+            linear: least squares over the genes plus a constant
+   '''
+
+   # Children whose distances are computed at once
+   chunk = 1024
+
+   def __init__(self, surrogateType, surrogateSize, surrogateNeighbours, geneType, geneChoice, **rest):
+      if (surrogateType not in ("knn", "linear")):
+         raise CustomException("surrogateType not implemented")
+      self.surrogateType = surrogateType
+      self.maxSize = surrogateSize
+      self.neighbours = surrogateNeighbours
+      self.hamming = geneType == 'C'
+      self.symbols = len(geneChoice)
+      self.genes = None
+      self.fitness = None
+      self.coefficients = None
+
+      # Accuracy on the children evaluated after a prediction: absolute error and sums of the correlation
+      self.predictions = 0
+      self.discarded = 0
+      self.absoluteError = 0.0
+      self.sums = numpy.zeros(5)
+
+   def __len__(self):
+      return 0 if self.fitness is None else len(self.fitness)
+
+   def learn(self, genes, fitness):
+      if (self.genes is None):
+         self.genes, self.fitness = genes, fitness
+      else:
+         self.genes = numpy.concatenate((self.genes, genes))[-self.maxSize:]
+         self.fitness = numpy.concatenate((self.fitness, fitness))[-self.maxSize:]
+      self.coefficients = None
+
+   def get_state(self):
+      ''' Learnt chromosomes and accuracy counters as arrays, for checkpoints '''
+      return {"surrogateGenes": numpy.zeros((0, 0)) if self.genes is None else self.genes,
+              "surrogateFitness": numpy.zeros(0) if self.fitness is None else self.fitness,
+              "surrogateCounters": numpy.concatenate(([self.predictions, self.discarded, self.absoluteError],
+                                                      self.sums))}
+
+   def set_state(self, genes, fitness, counters):
+      self.genes, self.fitness = (None, None) if len(fitness) == 0 else (genes, fitness)
+      self.coefficients = None
+      predictions, discarded, self.absoluteError = counters[:3].tolist()
+      self.predictions, self.discarded = int(predictions), int(discarded)
+      self.sums = counters[3:].copy()
+
+   def predict(self, genes):
+      if (self.surrogateType == "knn"):
+         return self.predict_knn(genes)
+      return self.predict_linear(genes)
+
+   def one_hot(self, genes):
+      ''' One column per gene and symbol, 1 where the gene is that symbol '''
+      return numpy.eye(self.symbols, dtype=numpy.float32)[genes].reshape(len(genes), -1)
+
+   def predict_knn(self, genes):
+      ''' Distances, neighbours and their mean for chunk children at a time, memory is chunk x surrogateSize '''
+      neighbours = min(self.neighbours, len(self))
+      if (self.hamming):
+         known = self.one_hot(self.genes).T
+      else:
+         known = self.genes.astype(float).T
+         knownSquares = (known ** 2).sum(axis=0)
+
+      predicted = numpy.empty(len(genes))
+      for i in range(0, len(genes), self.chunk):
+         if (self.hamming):
+            # Genes minus the equal ones, one_hot(a) @ one_hot(b).T counts the equal genes of every pair
+            distances = genes.shape[1] - self.one_hot(genes[i:i + self.chunk]) @ known
+         else:
+            # |a - b|^2 = |a|^2 + |b|^2 - 2ab, without the 3D array of differences
+            rows = genes[i:i + self.chunk].astype(float)
+            distances = (rows ** 2).sum(axis=1)[:, None] + knownSquares - 2 * rows @ known
+         nearest = numpy.argpartition(distances, neighbours - 1, axis=1)[:, :neighbours]
+         predicted[i:i + self.chunk] = self.fitness[nearest].mean(axis=1)
+      return predicted
+
+   def predict_linear(self, genes):
+      if (self.coefficients is None):
+         known = numpy.column_stack((self.genes, numpy.ones(len(self)))).astype(float)
+         self.coefficients = numpy.linalg.lstsq(known, self.fitness, rcond=None)[0]
+      return numpy.column_stack((genes, numpy.ones(len(genes)))).astype(float) @ self.coefficients
+
+   def track(self, predicted, fitness):
+      ''' Compares the predictions with the real fitness of the evaluated children '''
+      self.predictions += len(fitness)
+      self.absoluteError += numpy.abs(predicted - fitness).sum().item()
+      self.sums += (predicted.sum(), fitness.sum(), (predicted ** 2).sum(), (fitness ** 2).sum(),
+                    (predicted * fitness).sum())
+
+   def accuracy(self):
+      '''   surrogateError: mean absolute error, surrogateCorrelation: between predicted and real fitness,
+            surrogateDiscarded: children never evaluated
+      '''
+      n = self.predictions
+      predicted, real, predicted2, real2, product = self.sums
+      deviations = (n * predicted2 - predicted ** 2) * (n * real2 - real ** 2)
+      return {"surrogateError": self.absoluteError / n if n else None,
+              "surrogateCorrelation": ((n * product - predicted * real) / deviations ** 0.5).item()
+                                      if deviations > 0 else None,
+              "surrogateDiscarded": self.discarded}
+
+
+def surrogate_screen(genes, surrogate, surrogateRate, surrogateMin, predict=None, **rest):
+   '''   Returns the indexes of the children worth a real evaluation and their predicted fitness /
+            the surrogateRate fraction with the best prediction, every child (and no prediction)
+            until the surrogate has learnt surrogateMin chromosomes
+            predict: function of genes used instead of surrogate.predict (packed genes)
+   '''
+   if (len(surrogate) < max(surrogateMin, 1) or len(genes) == 0):
+      return numpy.arange(len(genes)), None
+
+   predicted = (predict or surrogate.predict)(genes)
+   kept = best_indexes_array(predicted, max(1, int(numpy.ceil(surrogateRate * len(genes)))))
+   surrogate.discarded += len(genes) - len(kept)
+   return kept, predicted[kept]
+
+
 # ------------------------------------------------------------------------------------------------------------
 
 # ------------------------------------------------------------------------------------------------------------
@@ -168,27 +806,130 @@ def evaluation_individual(population, evaluationFunction, **rest):
 
 def selection_generator(population, selectionType, **rest):
    '''   Generates chromosomes for reproduction based on selectionType 
-            selectionType E {roulette_wheel, truncation, rank}
+            selectionType E {roulette, truncation, rank, tournament}
    '''
    if (selectionType == "roulette"):
       return selection_roulette(population, **rest)
+   elif (selectionType == "truncation"):
+      return selection_truncation(population, **rest)
+   elif (selectionType == "rank"):
+      return selection_rank(population, **rest)
+   elif (selectionType == "tournament"):
+      return selection_tournament(population, **rest)
    else:
       raise CustomException("selectionType not implemented")
 
 
-def selection_roulette(population, **rest):
+def roulette_table(fitness):
+   '''   Cumulative fitness table, built once per generation /
+            an individual i is drawn when table[i-1] < randomVal <= table[i]
+            negative fitness is shifted to start at 0 and all 0 fitness is drawn uniformly
+   '''
+   fitness = list(fitness)
+   lowest = min(fitness)
+   if (lowest < 0):
+      fitness = [value - lowest for value in fitness]
+   table = list(itertools.accumulate(fitness))
+   if (table[-1] <= 0):
+      table = list(range(1, len(fitness) + 1))
+   return table
+
+
+def selection_roulette(population, rng=defaultGenerator, **rest):
    ''' Selects individuals giving more probability for those with better fitness'''
-   fitnessSum = sum(individual["fitness"] for individual in population)
+   table = roulette_table(individual["fitness"] for individual in population)
+   last = len(table) - 1
+
+   for randomVal in random_stream(lambda block: rng.uniform(0, table[-1], block)):
+      yield population[min(bisect.bisect_left(table, randomVal), last)]
+
+
+def selection_roulette_batch(population, size, rng=defaultGenerator, **rest):
+   ''' Draws size individuals by roulette in one vectorized call '''
+   fitness = numpy.array([individual["fitness"] for individual in population], dtype=float)
+   return [population[i] for i in selection_roulette_array(fitness, size, rng)]
+
+
+def selection_truncation(population, truncationRate, rng=defaultGenerator, **rest):
+   ''' Selects randomly among the best truncationRate of the population '''
+   best = best_individuals(population, max(1, int(len(population) * truncationRate)))
+
+   for i in random_stream(lambda block: rng.integers(0, len(best), block)):
+      yield best[i]
+
+
+def selection_rank(population, rng=defaultGenerator, **rest):
+   ''' Selects individuals with probability proportional to their rank, worst 1 and best n '''
+   order = sorted(population, key = lambda k: k['fitness'])
+   table = list(itertools.accumulate(range(1, len(order) + 1)))
+
+   for randomVal in random_stream(lambda block: rng.uniform(0, table[-1], block)):
+      yield order[bisect.bisect_left(table, randomVal)]
+
+
+def selection_tournament(population, tournamentSize, rng=defaultGenerator, **rest):
+   ''' Selects the best of tournamentSize random individuals '''
+   for competitors in random_stream(lambda block: rng.integers(0, len(population), (block, tournamentSize))):
+      yield max((population[i] for i in competitors), key = lambda k: k['fitness'])
+
+
+def selection_array(fitness, size, selectionType, **rest):
+   '''   Returns size indexes of individuals chosen for reproduction based on selectionType
+            selectionType E {roulette, truncation, rank, tournament}
+   '''
+   if (selectionType == "roulette"):
+      return selection_roulette_array(fitness, size, **rest)
+   elif (selectionType == "truncation"):
+      return selection_truncation_array(fitness, size, **rest)
+   elif (selectionType == "rank"):
+      return selection_rank_array(fitness, size, **rest)
+   elif (selectionType == "tournament"):
+      return selection_tournament_array(fitness, size, **rest)
+   else:
+      raise CustomException("selectionType not implemented")
+
+
+def roulette_table_array(fitness):
+   ''' Same as roulette_table for a fitness array '''
+   lowest = fitness.min()
+   if (lowest < 0):
+      fitness = fitness - lowest
+   table = numpy.cumsum(fitness)
+   if (table[-1] <= 0):
+      table = numpy.arange(1.0, len(fitness) + 1)
+   return table
+
+
+def selection_roulette_array(fitness, size, rng=defaultGenerator, **rest):
+   ''' Selects individuals giving more probability for those with better fitness'''
+   table = roulette_table_array(fitness)
+   randomVal = rng.uniform(0, table[-1], size)
+   return numpy.minimum(table.searchsorted(randomVal), len(table) - 1)
+
+
+def selection_truncation_array(fitness, size, truncationRate, rng=defaultGenerator, **rest):
+   ''' Selects randomly among the best truncationRate, found by partitioning '''
+   best = max(1, int(len(fitness) * truncationRate))
+   if (best < len(fitness)):
+      candidates = numpy.argpartition(-fitness, best - 1)[:best]
+   else:
+      candidates = numpy.arange(len(fitness))
+   return candidates[rng.integers(0, len(candidates), size)]
+
+
+def selection_rank_array(fitness, size, rng=defaultGenerator, **rest):
+   ''' Selects individuals with probability proportional to their rank, worst 1 and best n '''
+   order = numpy.argsort(fitness, kind="stable")
+   table = numpy.cumsum(numpy.arange(1.0, len(fitness) + 1))
+   randomVal = rng.uniform(0, table[-1], size)
+   return order[numpy.minimum(table.searchsorted(randomVal), len(table) - 1)]
+
+
+def selection_tournament_array(fitness, size, tournamentSize, rng=defaultGenerator, **rest):
+   ''' Selects the best of tournamentSize random individuals, every tournament at once '''
+   competitors = rng.integers(0, len(fitness), (size, tournamentSize))
+   return competitors[numpy.arange(size), fitness[competitors].argmax(axis=1)]
 
-   while True:
-      randomVal = random.uniform(0, 1)
-      partialSum = 0
-      for individual in population:
-         partialSum += (individual["fitness"] / fitnessSum)
-         if (partialSum >= randomVal):
-            yield individual
-            break
-            
             
 # ------------------------------------------------------------------------------------------------------------
 
@@ -198,40 +939,203 @@ def selection_roulette(population, **rest):
 
 def crossover(population, children, crossoverType, **rest):
    '''   Cross chromosomes to breed
-            crossoverType E {onepoint, twopoint}
+            crossoverType E {onepoint, twopoint, uniform}
    '''
    if (crossoverType == 'onepoint'):
       crossover_onepoint(population, children, **rest)   
    elif (crossoverType == 'twopoint'):
       crossover_twopoint(population, children, **rest)
+   elif (crossoverType == 'uniform'):
+      crossover_uniform(population, children, **rest)
    else:
       raise CustomException("crossoverType not implemented")
 
 
 def crossover_onepoint(population, children, selectionType, crossoverMin, crossoverMax, **rest):
-   rg = selection_generator(population, selectionType)
-   crossTimes = random.randint(crossoverMin, crossoverMax)
-   
-   for times in range (crossTimes):
-   
-      ch1 = next(rg)
-      ch2 = next(rg)
-      
-      pointMax = min(len(ch1["chromosome"]), len(ch2["chromosome"]))
-      point = random.randint(0, pointMax)
+   crossover_dict(population, children, 'onepoint', selectionType, crossoverMin, crossoverMax, **rest)
 
-      baby1 = {"chromosome":list(), "fitness":0}
-      baby2 = {"chromosome":list(), "fitness":0}
-      baby1["chromosome"] = ch1["chromosome"][:point]+ch2["chromosome"][point:]
-      baby2["chromosome"] = ch2["chromosome"][:point]+ch1["chromosome"][point:]
 
-      children.append(baby1)
-      children.append(baby2)
+def crossover_twopoint(population, children, selectionType, crossoverMin, crossoverMax, **rest):
+   crossover_dict(population, children, 'twopoint', selectionType, crossoverMin, crossoverMax, **rest)
 
 
-def crossover_twopoint(population, children, selectionType, crossoverMin, crossoverMax, **rest):
-   # TODO:
-   raise CustomException("crossoverType not implemented")
+def crossover_uniform(population, children, selectionType, crossoverMin, crossoverMax, **rest):
+   crossover_dict(population, children, 'uniform', selectionType, crossoverMin, crossoverMax, **rest)
+
+
+def crossover_dict(population, children, crossoverType, selectionType, crossoverMin, crossoverMax,
+                   rng=defaultGenerator, **rest):
+   '''   Selects every pair of parents and crosses them all at once in ragged arrays,
+         chromosomes can have different lengths
+   '''
+   rg = selection_generator(population, selectionType, rng=rng, **rest)
+   crossTimes = rng.integers(crossoverMin, crossoverMax, endpoint=True)
+   if (crossTimes == 0):
+      return
+
+   parents = [next(rg) for times in range(2 * crossTimes)]
+   genes, offsets, fitness = encode_ragged(parents, **rest)
+   pairs = numpy.arange(2 * crossTimes).reshape(crossTimes, 2)
+
+   childGenes, childOffsets = crossover_pairs_ragged(genes, offsets, pairs, crossoverType, rng=rng, **rest)
+   children.extend(decode_ragged(childGenes, childOffsets, numpy.zeros(len(childOffsets) - 1), **rest))
+
+
+def crossover_array(genes, fitness, crossoverType, selectionType, crossoverMin, crossoverMax,
+                    rng=defaultGenerator, **rest):
+   '''   Returns the children genes array, every pair of parents is crossed at once
+            crossoverType E {onepoint, twopoint, uniform}
+   '''
+   crossTimes = rng.integers(crossoverMin, crossoverMax, endpoint=True)
+   pairs = selection_array(fitness, 2 * crossTimes, selectionType, rng=rng, **rest).reshape(crossTimes, 2)
+   return crossover_pairs_array(genes, pairs, crossover_mask(crossoverType)(crossTimes, genes.shape[1], rng))
+
+
+def crossover_packed(genes, fitness, chromosomeSize, crossoverType, selectionType, crossoverMin, crossoverMax,
+                     packedChunk=4096, rng=defaultGenerator, **rest):
+   '''   Same as crossover_array for the packed engine, bits are crossed with masks packed the same way,
+         drawn for packedChunk pairs at a time
+   '''
+   if (not packed_bits(**rest)):
+      return crossover_array(genes, fitness, crossoverType, selectionType, crossoverMin, crossoverMax, rng, **rest)
+
+   crossTimes = rng.integers(crossoverMin, crossoverMax, endpoint=True)
+   pairs = selection_array(fitness, 2 * crossTimes, selectionType, rng=rng, **rest).reshape(crossTimes, 2)
+   chunk = max(1, packedChunk)
+   masks = [numpy.packbits(crossover_mask(crossoverType)(len(pairs[i:i + chunk]), chromosomeSize, rng), axis=1)
+            for i in range(0, crossTimes, chunk)]
+   return crossover_pairs_packed(genes, pairs, numpy.concatenate(masks or [genes[:0]]))
+
+
+def crossover_ragged(genes, offsets, fitness, crossoverType, selectionType, crossoverMin, crossoverMax,
+                     rng=defaultGenerator, **rest):
+   '''   Returns the children genes and offsets of a ragged population, every pair of parents is crossed at once
+            crossoverType E {onepoint, twopoint, uniform}
+   '''
+   crossTimes = rng.integers(crossoverMin, crossoverMax, endpoint=True)
+   pairs = selection_array(fitness, 2 * crossTimes, selectionType, rng=rng, **rest).reshape(crossTimes, 2)
+   return crossover_pairs_ragged(genes, offsets, pairs, crossoverType, rng=rng, **rest)
+
+
+def crossover_pairs_ragged(genes, offsets, pairs, crossoverType, chromosomeMin, chromosomeMax,
+                           rng=defaultGenerator, **rest):
+   '''   Crosses every pair of parents (a, b) of a ragged population in one operation,
+         children are joined segments of their parents /
+            onepoint: a[:p] + b[q:] and b[:q] + a[p:]
+            twopoint: a[:p1] + b[q1:q2] + a[p2:] and b[:q1] + a[p1:p2] + b[q2:]
+            uniform: genes of the shared length from either parent, the rest from its own parent
+   '''
+   starts = offsets[pairs]
+   lengths = offsets[pairs + 1] - starts
+   a, b = starts[:, 0], starts[:, 1]
+   aLength, bLength = lengths[:, 0], lengths[:, 1]
+
+   if (crossoverType == 'onepoint'):
+      p1 = rng.integers(0, aLength, endpoint=True)
+      p2 = aLength
+   elif (crossoverType == 'twopoint'):
+      p1, p2 = numpy.sort(rng.integers(0, aLength[:, None], (len(pairs), 2), endpoint=True), axis=1).T
+   elif (crossoverType == 'uniform'):
+      return crossover_uniform_ragged(genes, a, b, aLength, bLength, rng)
+   else:
+      raise CustomException("crossoverType not implemented")
+
+   # The segment of b has a length that keeps both children inside chromosomeMin..chromosomeMax
+   aSegment = p2 - p1
+   low = numpy.maximum.reduce([numpy.zeros_like(aSegment), chromosomeMin - aLength + aSegment,
+                               bLength + aSegment - chromosomeMax])
+   high = numpy.minimum.reduce([bLength, chromosomeMax - aLength + aSegment, bLength + aSegment - chromosomeMin])
+   bSegment = rng.integers(low, high, endpoint=True)
+   if (crossoverType == 'onepoint'):
+      q1 = bLength - bSegment
+   else:
+      q1 = rng.integers(0, bLength - bSegment, endpoint=True)
+   q2 = q1 + bSegment
+
+   segmentStarts = numpy.stack((a, b + q1, a + p2, b, a + p1, b + q2), axis=1).reshape(-1, 3)
+   segmentLengths = numpy.stack((p1, bSegment, aLength - p2, q1, aSegment, bLength - q2), axis=1).reshape(-1, 3)
+   indexes = ragged_indexes(segmentStarts.ravel(), segmentLengths.ravel())
+   return genes[indexes], ragged_offsets(segmentLengths.sum(axis=1))
+
+
+def crossover_uniform_ragged(genes, a, b, aLength, bLength, rng=defaultGenerator):
+   '''   Children keep the length of their first parent, every shared position is swapped
+         between both children with the same probability
+   '''
+   childLengths = numpy.stack((aLength, bLength), axis=1).ravel()
+   owns = numpy.repeat(numpy.stack((a, b), axis=1).ravel(), childLengths)
+   others = numpy.repeat(numpy.stack((b, a), axis=1).ravel(), childLengths)
+   otherLengths = numpy.repeat(numpy.stack((bLength, aLength), axis=1).ravel(), childLengths)
+
+   childOffsets = ragged_offsets(childLengths)
+   positions = numpy.arange(childOffsets[-1]) - numpy.repeat(childOffsets[:-1], childLengths)
+   shared = positions < otherLengths
+
+   # One draw for every shared position of a pair, used by both children
+   pairs = numpy.repeat(numpy.arange(len(childLengths)) // 2, childLengths)
+   sharedOffsets = ragged_offsets(numpy.minimum(aLength, bLength))
+   swaps = numpy.zeros(len(positions), dtype=bool)
+   swaps[shared] = (rng.random(sharedOffsets[-1]) < 0.5)[sharedOffsets[pairs[shared]] + positions[shared]]
+
+   return genes[numpy.where(swaps, others, owns) + positions], childOffsets
+
+
+def crossover_mask(crossoverType):
+   '''   Mask function of crossoverType
+            crossoverType E {onepoint, twopoint, uniform}
+   '''
+   if (crossoverType == 'onepoint'):
+      return crossover_onepoint_mask
+   elif (crossoverType == 'twopoint'):
+      return crossover_twopoint_mask
+   elif (crossoverType == 'uniform'):
+      return crossover_uniform_mask
+   else:
+      raise CustomException("crossoverType not implemented")
+
+
+def crossover_pairs_array(genes, pairs, masks):
+   '''   Crosses every pair of parent indexes in one operation /
+            masks[i, j] True: first child of pair i takes gene j from the first parent, second child from the second
+   '''
+   fathers = genes[pairs[:, 0]]
+   mothers = genes[pairs[:, 1]]
+
+   children = numpy.empty((2 * len(pairs), genes.shape[1]), dtype=genes.dtype)
+   children[0::2] = numpy.where(masks, fathers, mothers)
+   children[1::2] = numpy.where(masks, mothers, fathers)
+   return children
+
+
+def crossover_pairs_packed(genes, pairs, masks):
+   '''   Same as crossover_pairs_array on packed bits: every byte of a child is
+         (father & mask) | (mother & ~mask), 8 genes at once
+   '''
+   fathers = genes[pairs[:, 0]]
+   mothers = genes[pairs[:, 1]]
+
+   children = numpy.empty((2 * len(pairs), genes.shape[1]), dtype=genes.dtype)
+   children[0::2] = (fathers & masks) | (mothers & ~masks)
+   children[1::2] = (mothers & masks) | (fathers & ~masks)
+   return children
+
+
+def crossover_onepoint_mask(pairs, chromosomeSize, rng=defaultGenerator):
+   ''' Genes before a random cut point come from the first parent '''
+   points = rng.integers(0, chromosomeSize, pairs, endpoint=True)
+   return numpy.arange(chromosomeSize) < points[:, None]
+
+
+def crossover_twopoint_mask(pairs, chromosomeSize, rng=defaultGenerator):
+   ''' Genes between two random cut points come from the second parent '''
+   points = numpy.sort(rng.integers(0, chromosomeSize, (pairs, 2), endpoint=True), axis=1)
+   positions = numpy.arange(chromosomeSize)
+   return (positions < points[:, :1]) | (positions >= points[:, 1:])
+
+
+def crossover_uniform_mask(pairs, chromosomeSize, rng=defaultGenerator):
+   ''' Every gene comes from either parent with the same probability '''
+   return rng.random((pairs, chromosomeSize)) < 0.5
 
 
 # ------------------------------------------------------------------------------------------------------------
@@ -261,27 +1165,100 @@ def mutation(children, mutationType, **rest):
       raise CustomException("mutationType not implemented")
 
 
-def mutation_flipbit(children, mutationGeneRate, geneType, geneMin, geneMax, geneChoice, **rest):
+def mutation_flipbit(children, mutationGeneRate, geneType, geneMin, geneMax, geneChoice, rng=defaultGenerator, **rest):
    ''' Inverts the bits of a gene '''
-   # TODO
-   raise CustomException("mutationType not implemented")
+   mutation_dict(children, mutation_flipbit_array, mutationGeneRate, geneType, geneMin, geneMax, geneChoice, rng)
 
 
-def mutation_boundary(children, mutationGeneRate, geneType, geneMin, geneMax, geneChoice, **rest):
+def mutation_boundary(children, mutationGeneRate, geneType, geneMin, geneMax, geneChoice, rng=defaultGenerator, **rest):
    ''' Chooses a boundary value randomly '''
-   # TODO
-   raise CustomException("mutationType not implemented")
+   mutation_dict(children, mutation_boundary_array, mutationGeneRate, geneType, geneMin, geneMax, geneChoice, rng)
 
    
-def mutation_uniform(children, mutationGeneRate, geneType, geneMin, geneMax, geneChoice, **rest):
+def mutation_uniform(children, mutationGeneRate, geneType, geneMin, geneMax, geneChoice, rng=defaultGenerator, **rest):
    ''' Chooses a random value between boundaries '''
-   gg = gene_generator(geneType, geneMin, geneMax, geneChoice)
-   
-   for individual in children:
-      for i, gene in enumerate(individual["chromosome"]): # Use enumerate to mutate gene outofscope
-         randomVal = random.uniform(0,1) # PUUFFF
-         if (randomVal < mutationGeneRate):
-            individual["chromosome"][i] = next(gg)
+   mutation_dict(children, mutation_uniform_array, mutationGeneRate, geneType, geneMin, geneMax, geneChoice, rng)
+
+
+def mutation_dict(children, mutationArray, mutationGeneRate, geneType, geneMin, geneMax, geneChoice, rng):
+   '''   Mutates every gene of every child at once: chromosomes are joined in one array,
+         mutated by mutationArray and split again
+   '''
+   if (not children):
+      return
+   lengths = [len(individual["chromosome"]) for individual in children]
+   genes = encode_genes([gene for individual in children for gene in individual["chromosome"]], geneType, geneChoice)
+
+   mutationArray(genes, mutationGeneRate, geneType, geneMin, geneMax, geneChoice, rng)
+
+   genes = decode_chromosome(genes, geneType, geneChoice)
+   start = 0
+   for individual, length in zip(children, lengths):
+      individual["chromosome"] = genes[start:start + length]
+      start += length
+
+
+def mutation_array(children, mutationType, **rest):
+   '''   Muatate children genes array in place
+         mutationType E {flipbit, boundary, uniform}
+   '''
+   if (mutationType == 'flipbit'):
+      mutation_flipbit_array(children, **rest)
+   elif(mutationType == 'boundary'):
+      mutation_boundary_array(children, **rest)
+   elif(mutationType == 'uniform'):
+      mutation_uniform_array(children, **rest)
+   else:
+      raise CustomException("mutationType not implemented")
+
+
+def mutation_mask(shape, mutationGeneRate, rng=defaultGenerator):
+   ''' One Bernoulli draw for every gene of every child, True: mutate '''
+   return rng.random(shape) < mutationGeneRate
+
+
+def mutation_flipbit_array(children, mutationGeneRate, geneType, geneMin, geneMax, geneChoice, rng=defaultGenerator, **rest):
+   '''   Inverts the bits of a gene: gene - geneMin is replaced by its complement inside the range,
+         the mirrored value geneMin + geneMax - gene (1 - gene for 0/1 genes)
+   '''
+   low, high = gene_bounds(geneType, geneMin, geneMax, geneChoice)
+   mask = mutation_mask(children.shape, mutationGeneRate, rng)
+   children[mask] = low + high - children[mask]
+
+
+def mutation_boundary_array(children, mutationGeneRate, geneType, geneMin, geneMax, geneChoice, rng=defaultGenerator, **rest):
+   ''' Chooses a boundary value randomly '''
+   low, high = gene_bounds(geneType, geneMin, geneMax, geneChoice)
+   mask = mutation_mask(children.shape, mutationGeneRate, rng)
+   children[mask] = numpy.where(rng.random(numpy.count_nonzero(mask)) < 0.5, low, high)
+
+
+def mutation_uniform_array(children, mutationGeneRate, geneType, geneMin, geneMax, geneChoice, rng=defaultGenerator, **rest):
+   ''' Chooses a random value between boundaries, one mask for every gene of every child '''
+   mask = mutation_mask(children.shape, mutationGeneRate, rng)
+   children[mask] = gene_generator_array(numpy.count_nonzero(mask), geneType, geneMin, geneMax, geneChoice, rng)
+
+
+def mutation_packed(children, chromosomeSize, mutationType, mutationGeneRate, packedChunk=4096,
+                    rng=defaultGenerator, **rest):
+   '''   Mutates packed children in place, the mutation mask is packed as the genes
+         and drawn for packedChunk children at a time /
+            flipbit: children ^ mask
+            boundary, uniform: random bits where the mask is set (the same for 0/1 genes)
+   '''
+   if (not packed_bits(**rest)):
+      return mutation_array(children, mutationType, mutationGeneRate=mutationGeneRate, rng=rng, **rest)
+
+   if (mutationType not in ('flipbit', 'boundary', 'uniform')):
+      raise CustomException("mutationType not implemented")
+   chunk = max(1, packedChunk)
+   for i in range(0, len(children), chunk):
+      rows = children[i:i + chunk]
+      mask = numpy.packbits(mutation_mask((len(rows), chromosomeSize), mutationGeneRate, rng), axis=1)
+      if (mutationType == 'flipbit'):
+         rows ^= mask
+      else:
+         rows ^= (rows ^ rng.integers(0, 256, rows.shape, dtype=numpy.uint8)) & mask
 
 
 # ------------------------------------------------------------------------------------------------------------
@@ -292,38 +1269,67 @@ def mutation_uniform(children, mutationGeneRate, geneType, geneMin, geneMax, gen
 
 def reduction(population, children, reductionType, **rest):
    '''   Reduce population and children to the next population generation 
-            reductionType E {surlvivalChildren, roulette}
+            reductionType E {surlvivalChildren, roulette, steadyState}
    '''
    if (reductionType == "survivalChildren"):
       reduction_survivalChildren(population, children, **rest)
    elif (reductionType == "roulette"):
       reduction_roulette(population, children, **rest)
+   elif (reductionType == "steadyState"):
+      reduction_steadyState(population, children, **rest)
    else:
       raise CustomException("reductionType not implemented")
 
 
 def reduction_survivalChildren(population, children, populationMax, populationMin, **rest):
-   '''   Only children survives '''
-   population[:] = children
+   '''   Only children survives, the best ones when there are more than populationMax
+         and the best of the population fill up to populationMin
+   '''
+   if (len(children) > populationMax):
+      population[:] = best_individuals(children, populationMax)
+   elif (len(children) < populationMin):
+      population[:] = children + best_individuals(population, populationMin - len(children))
+   else:
+      population[:] = children
 
-   while (len(population) > populationMax):
-      # TODO: 
-      pass
-   
-   while (len(population) < populationMin):
-      # TODO: 
-      pass
+
+def worst_heap(fitness):
+   ''' Min-heap of (fitness, position): the worst individual is always heap[0] '''
+   heap = [(value, i) for i, value in enumerate(fitness)]
+   heapq.heapify(heap)
+   return heap
+
+
+def reduction_steadyState(population, children, worstHeap=None, **rest):
+   '''   Every child better than the worst individual replaces it in place, O(log n) each /
+            worstHeap: worst_heap of the population kept between calls, filled when empty and rebuilt
+            when its worst position no longer holds its fitness (the population was reordered)
+            the best individual is never replaced (elitism)
+   '''
+   if (worstHeap is None):
+      worstHeap = []
+   if (not worstHeap):
+      worstHeap[:] = worst_heap(individual["fitness"] for individual in population)
+
+   for child in children:
+      worstFitness, worst = worstHeap[0]
+      if (worst >= len(population) or population[worst]["fitness"] != worstFitness):
+         worstHeap[:] = worst_heap(individual["fitness"] for individual in population)
+         worstFitness, worst = worstHeap[0]
+      if (child["fitness"] > worstFitness):
+         population[worst] = child
+         heapq.heapreplace(worstHeap, (child["fitness"], worst))
       
       
-def reduction_roulette(population, children, populationMin, populationMax, **rest):
+def reduction_roulette(population, children, populationMin, populationMax, rng=defaultGenerator, **rest):
    '''   Chooses by roulette alternating half from population and half children '''
    
-   populationGenerator = selection_generator(population, selectionType = "roulette")
-   childrenGenerator = selection_generator(children, selectionType = "roulette")
+   populationGenerator = selection_generator(population, selectionType = "roulette", rng = rng)
+   childrenGenerator = selection_generator(children, selectionType = "roulette", rng = rng)
    
    new_population = []
    
-   newPopulationSize = random.randint(populationMin, populationMax)
+   newPopulationSize = rng.integers(populationMin, populationMax, endpoint=True)
    
    while len(new_population) < newPopulationSize:
       new_population.append(next(populationGenerator))
@@ -333,22 +1339,102 @@ def reduction_roulette(population, children, populationMin, populationMax, **res
    population[:] = new_population
 
 
+def reduction_array(genes, fitness, childGenes, childFitness, reductionType, **rest):
+   '''   Returns the genes and fitness arrays of the next population generation
+            reductionType E {surlvivalChildren, roulette, steadyState}
+   '''
+   if (reductionType == "survivalChildren"):
+      return reduction_survivalChildren_array(genes, fitness, childGenes, childFitness, **rest)
+   elif (reductionType == "roulette"):
+      return reduction_roulette_array(genes, fitness, childGenes, childFitness, **rest)
+   elif (reductionType == "steadyState"):
+      return reduction_steadyState_array(genes, fitness, childGenes, childFitness, **rest)
+   else:
+      raise CustomException("reductionType not implemented")
+
+
+def reduction_survivalChildren_array(genes, fitness, childGenes, childFitness, populationMax, populationMin, **rest):
+   '''   Only children survives, the best ones when there are more than populationMax
+         and the best of the population fill up to populationMin
+   '''
+   if (len(childGenes) > populationMax):
+      best = best_indexes_array(childFitness, populationMax)
+      return childGenes[best], childFitness[best]
+
+   if (len(childGenes) < populationMin):
+      best = best_indexes_array(fitness, populationMin - len(childGenes))
+      return (numpy.concatenate((childGenes, genes[best])),
+              numpy.concatenate((childFitness, fitness[best])))
+
+   return childGenes, childFitness
+
+
+def reduction_steadyState_array(genes, fitness, childGenes, childFitness, worstHeap=None, **rest):
+   '''   Same as reduction_steadyState, genes and fitness are updated in place and returned '''
+   if (worstHeap is None):
+      worstHeap = []
+   if (not worstHeap):
+      worstHeap[:] = worst_heap(fitness.tolist())
+
+   for child, childValue in enumerate(childFitness.tolist()):
+      worstFitness, worst = worstHeap[0]
+      if (worst >= len(fitness) or fitness[worst] != worstFitness):
+         worstHeap[:] = worst_heap(fitness.tolist())
+         worstFitness, worst = worstHeap[0]
+      if (childValue > worstFitness):
+         genes[worst] = childGenes[child]
+         fitness[worst] = childValue
+         heapq.heapreplace(worstHeap, (childValue, worst))
+   return genes, fitness
+
+
+def reduction_ragged(genes, offsets, fitness, childGenes, childOffsets, childFitness, **rest):
+   '''   Same as reduction_array for ragged populations: the array reduction chooses among chromosome
+         numbers and the survivors are copied once
+   '''
+   size = len(fitness)
+   numbers = numpy.arange(size + len(childFitness))[:, None]
+   numbers, fitness = reduction_array(numbers[:size], fitness, numbers[size:], childFitness, **rest)
+
+   genes, offsets = ragged_concatenate(genes, offsets, childGenes, childOffsets)
+   genes, offsets = ragged_take(genes, offsets, numbers[:, 0])
+   return genes, offsets, fitness
+
+
+def reduction_roulette_array(genes, fitness, childGenes, childFitness, populationMin, populationMax,
+                             rng=defaultGenerator, **rest):
+   '''   Chooses by roulette half from population and half children '''
+   newPopulationSize = rng.integers(populationMin, populationMax, endpoint=True)
+
+   fromPopulation = selection_roulette_array(fitness, (newPopulationSize + 1) // 2, rng)
+   fromChildren = selection_roulette_array(childFitness, newPopulationSize // 2, rng)
+
+   return (numpy.concatenate((genes[fromPopulation], childGenes[fromChildren])),
+           numpy.concatenate((fitness[fromPopulation], childFitness[fromChildren])))
+
+
 # ------------------------------------------------------------------------------------------------------------
 
 # ------------------------------------------------------------------------------------------------------------
 # STOP
 # ------------------------------------------------------------------------------------------------------------
 
-def stop(population, actualGeneration, stopType, stopValue, **rest):
+def stop(statistics, stopType, stopValue, **rest):
    '''   Stops algorithm when in run mode 
-            stopType E {generation}
+            stopType E {generation, fitness, time, stagnation}
+            statistics: get_statistics() plus best, elapsed and stagnation (see Algorithm.iter_generations)
    '''
+   if (isinstance(stopType, (list, tuple))):
+      return any(stop(statistics, oneType, oneValue) for oneType, oneValue in zip(stopType, stopValue))
+
    if (stopType == "generation"):
-      stop_generation(actualGeneration, stopValue)
-   if (stopType == "fitness"):
-      stop_fitness(population, stopValue)
-   if (stopType == "time"):
-      stop_time(population, stopValue)
+      return stop_generation(statistics["generation"], stopValue)
+   elif (stopType == "fitness"):
+      return stop_fitness(statistics["best"], stopValue)
+   elif (stopType == "time"):
+      return stop_time(statistics["elapsed"], stopValue)
+   elif (stopType == "stagnation"):
+      return stop_stagnation(statistics["stagnation"], stopValue)
    else:
       raise CustomException("stopType not implemented")
 
@@ -362,16 +1448,19 @@ def stop_generation(actualGeneration, stopValue):
       return False
 
 
-def stop_fitness(population, stopValue):
+def stop_fitness(bestFitness, stopValue):
    '''   Stops when a fitness value is reached '''
-   # TODO
-   raise CustomException("stopType not implemented")
+   return bestFitness >= stopValue
 
 
-def stop_time(population, stopValue):
-   '''   Stops when a fitness value is reached '''
-   # TODO
-   raise CustomException("stopType not implemented")
+def stop_time(elapsed, stopValue):
+   '''   Stops when stopValue seconds have passed '''
+   return elapsed >= stopValue
+
+
+def stop_stagnation(stagnation, stopValue):
+   '''   Stops after stopValue generations without improving the best individual '''
+   return stagnation >= stopValue
 
 # ------------------------------------------------------------------------------------------------------------
 
@@ -391,20 +1480,50 @@ def average(population):
    return avg
    
 
-def variance(population, decimals= 4, mean=0):
-   ''' Variance = sigma2 = (1/n) * Sum(xi - X) '''
-   if (mean == 0):
+def variance(population, decimals= 4, mean=None):
+   ''' Variance = sigma2 = (1/n) * Sum((xi - X)^2) '''
+   if (mean is None):
       mean = sum(individual["fitness"] for individual in population) / len(population)
       
-   sumDeviation = sum((individual["fitness"] - mean) for individual in population) / len(population)
-   sigma2 = (1/len(population)) * (sumDeviation**2)
+   sigma2 = sum((individual["fitness"] - mean)**2 for individual in population) / len(population)
    return round(sigma2, decimals)
 
 
 def sort_population(population):
    ''' Sort population for later selection '''
    population[:] = sorted(population, key = lambda k: k['fitness'], reverse=True)
-   
+
+
+def sort_population_array(genes, fitness):
+   ''' Returns genes and fitness sorted by fitness, best first '''
+   order = numpy.argsort(-fitness, kind="stable")
+   return genes[order], fitness[order]
+
+
+def best_individuals(population, size):
+   ''' Best size individuals, best first, without sorting the population '''
+   return heapq.nlargest(size, population, key = lambda k: k['fitness'])
+
+
+def worst_indexes(population, size):
+   ''' Positions of the worst size individuals, without sorting the population '''
+   return heapq.nsmallest(size, range(len(population)), key = lambda i: population[i]['fitness'])
+
+
+def best_indexes_array(fitness, size):
+   ''' Indexes of the best size fitness values, best first, partitioning instead of sorting everything '''
+   if (size >= len(fitness)):
+      return numpy.argsort(-fitness, kind="stable")
+   best = numpy.argpartition(-fitness, size - 1)[:size]
+   return best[numpy.argsort(-fitness[best], kind="stable")]
+
+
+def worst_indexes_array(fitness, size):
+   ''' Indexes of the worst size fitness values, in any order '''
+   if (size >= len(fitness)):
+      return numpy.arange(len(fitness))
+   return numpy.argpartition(fitness, size - 1)[:size]
+
 # ------------------------------------------------------------------------------------------------------------
 
 # ------------------------------------------------------------------------------------------------------------
@@ -418,78 +1537,564 @@ class Algorithm(object):
                "populationMin": 6, "populationMax": 6, 
                "chromosomeMin": 6, "chromosomeMax": 6,
                "geneType": 'Z', "geneMin": 0, "geneMax": 9, "geneChoice": "0123456789abcdef",
-               "selectionType": "roulette", 
+               "selectionType": "roulette", "truncationRate": 0.5, "tournamentSize": 3,
                "crossoverType": 'onepoint', "crossoverMin": 3, "crossoverMax": 3,
                "mutationType": 'uniform', "mutationGeneRate": 0.1, 
                "reductionType": "survivalChildren", "populationMin": 6, "populationMax": 6,
                "evaluationType": "population", "evaluationFunction":"evaluation_test",
-               "stopType": "generation", "stopValue": 100}
+               "evaluationWorkers": None, "evaluationChunk": 0, "cacheSize": 0,
+               "evaluationConcurrency": 16, "evaluationTimeout": None, "evaluationRetries": 0,
+               "surrogateType": None, "surrogateRate": 0.5, "surrogateSize": 1000, "surrogateNeighbours": 5,
+               "surrogateMin": 50,
+               "stopType": "generation", "stopValue": 100,
+               "engine": "dict", "packedChunk": 4096,
+               "checkpointInterval": 0, "checkpointPath": "simpleGA_checkpoint.npz",
+               "profile": False, "seed": None, "diversitySample": 0,
+               "telemetryPath": None, "telemetryFormat": "jsonl", "telemetryInterval": 1.0, "telemetryQueue": 10000}
+
+   callbackEvents = ("on_generation_start", "on_phase_end", "on_generation_end")
+   phaseNames = ("initialization", "crossover", "mutation", "surrogate", "evaluation", "reduction", "statistics",
+                 "checkpoint")
    
    population = list()
    children = list()
+
+   # Array engine: one row of genes per individual
+   genes = None
+   fitness = None
+
+   # Packed engine: genes of every chromosome, packed rows can be longer
+   chromosomeSize = 0
+
+   # Ragged engine: genes is 1D, chromosome i is genes[offsets[i]:offsets[i + 1]]
+   offsets = None
    
    generationNumber = 0
    bestIndividual = dict()
+
+   # Process pool kept alive between steps for parallel evaluation
+   executor = None
+
+   # Fitness of already evaluated chromosomes when cacheSize > 0
+   cache = None
+
+   # Model discarding children before their evaluation when surrogateType is set
+   surrogate = None
+
+   # steadyState reduction: worst_heap of the population, empty when it has to be rebuilt
+   worstHeap = None
    
    def __init__(self, config):
       
+      # Every instance gets its own copy of the mutable state
+      self.config = dict(self.config)
+      self.population = list()
+      self.children = list()
+      self.worstHeap = list()
+
+      # Profiling: seconds by phase for the whole run and for the last generation
+      self.phaseSeconds = dict()
+      self.generationPhaseSeconds = dict()
+      self.evaluations = 0
+      self.callbacks = {event: list() for event in self.callbackEvents}
+
       for key in config:
          if key in self.config:
             self.config[key] = config[key]
+
+      self.rng = numpy.random.default_rng(self.config["seed"])
+
+      # Statistics: own generator so reading them never changes the evolution,
+      # running aggregates of every evaluated fitness
+      self.statisticsRng = numpy.random.default_rng(self.config["seed"])
+      self.evaluated = simpleGA_statistics.RunningStatistics()
+
+      self.telemetry = None
+      if (self.config["telemetryPath"] is not None):
+         self.telemetry = simpleGA_telemetry.TelemetryWriter(self.config["telemetryPath"],
+                                                             self.config["telemetryFormat"],
+                                                             self.config["telemetryInterval"],
+                                                             self.config["telemetryQueue"])
+         self.add_callback("on_generation_end", Algorithm.send_telemetry)
+
+   def spawn(self, size):
+      ''' size independent random generators, for worker processes or islands '''
+      return self.rng.spawn(size)
    
+   def add_callback(self, event, function):
+      ''' event E {on_generation_start, on_phase_end, on_generation_end} '''
+      if (event not in self.callbacks):
+         raise CustomException("callback event not implemented")
+      self.callbacks[event].append(function)
+
+   def notify(self, event, *args):
+      for function in self.callbacks[event]:
+         function(self, *args)
+
+   @contextlib.contextmanager
+   def phase(self, name):
+      ''' Times the block when profiling, with telemetry or when someone listens to on_phase_end '''
+      if (not self.config["profile"] and self.telemetry is None and not self.callbacks["on_phase_end"]):
+         yield
+         return
+
+      start = time.perf_counter()
+      yield
+      seconds = time.perf_counter() - start
+
+      self.phaseSeconds[name] = self.phaseSeconds.get(name, 0.0) + seconds
+      self.generationPhaseSeconds[name] = self.generationPhaseSeconds.get(name, 0.0) + seconds
+      self.notify("on_phase_end", name, seconds)
+
+   def start_executor(self):
+      if (self.config["evaluationType"] == "parallel" and self.executor is None):
+         self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.config["evaluationWorkers"])
+
+   def start_surrogate(self):
+      if (self.config["surrogateType"] is None):
+         return
+      if (self.config["engine"] not in ("array", "packed")):
+         raise CustomException("surrogateType needs the array or packed engine")
+      self.surrogate = Surrogate(**self.config)
+
+   def close(self):
+      ''' Stops the process pool of parallel evaluation and writes the pending telemetry '''
+      if (self.executor is not None):
+         self.executor.shutdown()
+         self.executor = None
+      if (self.telemetry is not None):
+         self.telemetry.close()
+
+   def send_telemetry(self):
+      ''' Queues the statistics, best individual and phase seconds of the generation, never waits for the disk '''
+      record = self.get_statistics()
+      record["best"] = self.bestIndividual["fitness"]
+      record["bestChromosome"] = self.bestIndividual["chromosome"]
+      # Every phase in every record, so CSV columns do not depend on the first generation
+      if ("phases" in record):
+         record["phases"] = {name: self.phaseSeconds.get(name, 0.0) for name in self.phaseNames}
+      record["generationPhases"] = {name: self.generationPhaseSeconds.get(name, 0.0) for name in self.phaseNames}
+      self.telemetry.write(record)
+
+   def evaluate(self, population):
+      self.evaluations += len(population)
+      if (self.cache is not None):
+         evaluation_cached(population, self.cache, executor=self.executor, **self.config)
+      else:
+         evaluation(population, executor=self.executor, **self.config)
+      self.evaluated.update([individual["fitness"] for individual in population])
+
+   def evaluate_array(self, genes):
+      self.evaluations += len(genes)
+      if (self.cache is not None):
+         fitness = evaluation_cached_array(genes, self.cache, executor=self.executor, **self.config)
+      else:
+         fitness = evaluation_array(genes, executor=self.executor, **self.config)
+      self.evaluated.update(fitness)
+      return fitness
+
+   def evaluate_ragged(self, genes, offsets):
+      self.evaluations += len(offsets) - 1
+      if (self.cache is not None):
+         fitness = evaluation_cached_ragged(genes, offsets, self.cache, executor=self.executor, **self.config)
+      else:
+         fitness = evaluation_ragged(genes, offsets, executor=self.executor, **self.config)
+      self.evaluated.update(fitness)
+      return fitness
+
+   def pack(self, genes):
+      ''' Array engine genes to the storage of the engine '''
+      if (self.config["engine"] == "packed"):
+         return pack_genes(genes, **self.config)
+      return genes
+
+   def unpack(self, genes):
+      ''' Genes as stored by the engine to the array engine '''
+      if (self.config["engine"] == "packed"):
+         return unpack_genes(genes, self.chromosomeSize, **self.config)
+      return genes
+
+   def unpack_map(self, function, genes):
+      ''' function(unpacked genes) -> 1D array, packed genes are unpacked packedChunk chromosomes at a time '''
+      if (self.config["engine"] != "packed"):
+         return function(genes)
+      chunk = max(1, self.config["packedChunk"])
+      return numpy.concatenate([function(self.unpack(genes[i:i + chunk])) for i in range(0, len(genes), chunk)]
+                               or [numpy.zeros(0)])
+
+   def learn(self, genes, fitness):
+      ''' The surrogate learns the last surrogateSize chromosomes, only those are unpacked '''
+      size = self.config["surrogateSize"]
+      self.surrogate.learn(self.unpack(genes[-size:]), fitness[-size:])
+
    def initialize(self):
+      self.worstHeap.clear()
+      self.start_executor()
+      if (self.config["cacheSize"] > 0):
+         self.cache = FitnessCache(self.config["cacheSize"])
+      self.start_surrogate()
+      self.generationPhaseSeconds = dict()
+      if (self.config["engine"] in ("array", "packed")):
+         self.initialize_array()
+      elif (self.config["engine"] == "ragged"):
+         self.initialize_ragged()
+      else:
+         self.initialize_dict()
+      if (self.telemetry is not None):
+         self.send_telemetry()
+
+   def initialize_dict(self):
       self.generationNumber = 1
-      initialization(self.population, **self.config)
-      evaluation(self.population, **self.config)
-      sort_population(self.population)
-      self.bestIndividual = self.population[0]
+      with self.phase("initialization"):
+         initialization(self.population, rng=self.rng, **self.config)
+      with self.phase("evaluation"):
+         self.evaluate(self.population)
+      with self.phase("statistics"):
+         self.bestIndividual = max(self.population, key = lambda k: k['fitness'])
+
+   def initialize_array(self):
+      self.generationNumber = 1
+      with self.phase("initialization"):
+         if (self.config["engine"] == "packed"):
+            genes, self.chromosomeSize = initialization_packed(rng=self.rng, **self.config)
+         else:
+            genes = initialization_array(rng=self.rng, **self.config)
+            self.chromosomeSize = genes.shape[1]
+      with self.phase("evaluation"):
+         self.fitness = self.unpack_map(self.evaluate_array, genes)
+      if (self.surrogate is not None):
+         with self.phase("surrogate"):
+            self.learn(genes, self.fitness)
+      with self.phase("statistics"):
+         best = self.fitness.argmax()
+         self.bestIndividual = decode_individual(self.unpack(genes[best]), self.fitness[best], **self.config)
+      self.genes = genes
+
+   def initialize_ragged(self):
+      self.generationNumber = 1
+      with self.phase("initialization"):
+         self.genes, self.offsets = initialization_ragged(rng=self.rng, **self.config)
+      with self.phase("evaluation"):
+         self.fitness = self.evaluate_ragged(self.genes, self.offsets)
+      with self.phase("statistics"):
+         self.bestIndividual = self.get_individual(self.fitness.argmax())
 
    def step(self):
+      self.generationPhaseSeconds = dict()
+      self.notify("on_generation_start")
+
+      if (self.config["engine"] in ("array", "packed")):
+         self.step_array()
+      elif (self.config["engine"] == "ragged"):
+         self.step_ragged()
+      else:
+         self.step_dict()
+
+      interval = self.config["checkpointInterval"]
+      if (interval > 0 and self.generationNumber % interval == 0):
+         with self.phase("checkpoint"):
+            self.save_checkpoint(self.config["checkpointPath"])
+
+      self.notify("on_generation_end")
+
+   def step_dict(self):
 
       # 1.- Cross population
-      crossover(self.population, self.children, **self.config)
+      with self.phase("crossover"):
+         crossover(self.population, self.children, rng=self.rng, **self.config)
       
       # 2.- Mutate children
-      mutation(self.children, **self.config)
+      with self.phase("mutation"):
+         mutation(self.children, rng=self.rng, **self.config)
      
       # 3.- Evaluate children
-      evaluation(self.children, **self.config)
-      sort_population(self.children)
+      with self.phase("evaluation"):
+         self.evaluate(self.children)
       
       # 4.- Reduce population and children into population
-      reduction(self.population, self.children, **self.config)
-      sort_population(self.population)
+         # No sorting, operators that need an order do it themselves
+      with self.phase("reduction"):
+         reduction(self.population, self.children, rng=self.rng, worstHeap=self.worstHeap, **self.config)
 
-      self.children = list()
-      
       # 5.- Get statistics
-      if (self.population[0]["fitness"] > self.bestIndividual["fitness"]): 
-         self.bestIndividual = self.population[0]
+         # steadyState only changes the population with children, the best is searched there
+      with self.phase("statistics"):
+         candidates = self.children if self.config["reductionType"] == "steadyState" else self.population
+         best = max(candidates, key = lambda k: k['fitness'], default = self.bestIndividual)
+         if (best["fitness"] > self.bestIndividual["fitness"]): 
+            self.bestIndividual = best
+
+      self.children = list()
       
       self.generationNumber += 1
       
       # 6.- STOP?
-         # Only when running
+         # Only when running, see iter_generations
+
+   def step_array(self):
+      ''' Array and packed engines, packed children are only unpacked in chunks to be evaluated '''
+      packed = self.config["engine"] == "packed"
+      with self.phase("crossover"):
+         if (packed):
+            childGenes = crossover_packed(self.genes, self.fitness, self.chromosomeSize, rng=self.rng, **self.config)
+         else:
+            childGenes = crossover_array(self.genes, self.fitness, rng=self.rng, **self.config)
+      with self.phase("mutation"):
+         if (packed):
+            mutation_packed(childGenes, self.chromosomeSize, rng=self.rng, **self.config)
+         else:
+            mutation_array(childGenes, rng=self.rng, **self.config)
+
+      # Children predicted to be poor are discarded before the real evaluation
+      if (self.surrogate is not None):
+         with self.phase("surrogate"):
+            kept, predicted = surrogate_screen(childGenes, self.surrogate,
+                                               predict=functools.partial(self.unpack_map, self.surrogate.predict),
+                                               **self.config)
+            childGenes = childGenes[kept]
+
+      with self.phase("evaluation"):
+         childFitness = self.unpack_map(self.evaluate_array, childGenes)
+
+      if (self.surrogate is not None):
+         with self.phase("surrogate"):
+            if (predicted is not None):
+               self.surrogate.track(predicted, childFitness)
+            self.learn(childGenes, childFitness)
+
+      with self.phase("reduction"):
+         self.genes, self.fitness = reduction_array(self.genes, self.fitness, childGenes, childFitness,
+                                                     rng=self.rng, worstHeap=self.worstHeap, **self.config)
+
+      with self.phase("statistics"):
+         if (self.config["reductionType"] == "steadyState"):
+            genes, fitness = childGenes, childFitness
+         else:
+            genes, fitness = self.genes, self.fitness
+         if (len(fitness) > 0):
+            best = fitness.argmax()
+            if (fitness[best] > self.bestIndividual["fitness"]):
+               self.bestIndividual = decode_individual(self.unpack(genes[best]), fitness[best], **self.config)
+
+      self.generationNumber += 1
       
+   def step_ragged(self):
+      with self.phase("crossover"):
+         childGenes, childOffsets = crossover_ragged(self.genes, self.offsets, self.fitness,
+                                                     rng=self.rng, **self.config)
+      with self.phase("mutation"):
+         # Genes mutate one by one, the flat genes are mutated as a single chromosome
+         mutation_array(childGenes, rng=self.rng, **self.config)
+      with self.phase("evaluation"):
+         childFitness = self.evaluate_ragged(childGenes, childOffsets)
+
+      with self.phase("reduction"):
+         self.genes, self.offsets, self.fitness = reduction_ragged(self.genes, self.offsets, self.fitness,
+                                                                   childGenes, childOffsets, childFitness,
+                                                                   rng=self.rng, worstHeap=self.worstHeap,
+                                                                   **self.config)
+
+      with self.phase("statistics"):
+         best = self.fitness.argmax()
+         if (self.fitness[best] > self.bestIndividual["fitness"]):
+            self.bestIndividual = self.get_individual(best)
+
+      self.generationNumber += 1
+
+   def iter_generations(self):
+      '''   Steps until the stop configuration is reached, yielding the statistics of every generation
+               initializes first when it has not been done
+      '''
+      start = time.perf_counter()
+      if (self.generationNumber == 0):
+         self.initialize()
+
+      best = self.bestIndividual["fitness"]
+      stagnation = 0
+      while True:
+         statistics = self.get_statistics()
+         statistics["best"] = self.bestIndividual["fitness"]
+         statistics["elapsed"] = time.perf_counter() - start
+         statistics["stagnation"] = stagnation
+         yield statistics
+
+         if (stop(statistics, **self.config)):
+            return
+
+         self.step()
+         if (self.bestIndividual["fitness"] > best):
+            best = self.bestIndividual["fitness"]
+            stagnation = 0
+         else:
+            stagnation += 1
+
    def run(self):
-      # TODO
-      raise CustomException("run method not implemented")
+      ''' Steps until the stop configuration is reached and returns the best individual '''
+      for statistics in self.iter_generations():
+         pass
+      return self.bestIndividual
+
+   def save_checkpoint(self, path):
+      '''   Saves population, best individual, generation, random state, evaluated aggregates and the
+            surrogate in a .npz file
+               the evaluation function is not saved, load into an Algorithm with the same config
+      '''
+      offsets = self.offsets
+      if (self.config["engine"] in ("array", "packed", "ragged")):
+         genes, fitness = self.genes, self.fitness
+      else:
+         genes, offsets, fitness = encode_ragged(self.population, **self.config)
+      bestGenes, bestFitness = encode_population([self.bestIndividual], **self.config)
+
+      # Written aside and renamed so a crash never leaves a broken checkpoint
+      temporal = path + ".tmp"
+      with open(temporal, "wb") as checkpoint:
+         numpy.savez(checkpoint, genes=genes, fitness=fitness,
+                     bestGenes=bestGenes[0], bestFitness=bestFitness[0],
+                     generationNumber=self.generationNumber, chromosomeSize=self.chromosomeSize,
+                     offsets=offsets if offsets is not None else numpy.zeros(0, dtype=numpy.int64),
+                     randomState=json.dumps(self.rng.bit_generator.state),
+                     evaluated=self.evaluated.get_state(),
+                     **(self.surrogate.get_state() if self.surrogate is not None else {}))
+      os.replace(temporal, path)
+
+   def load_checkpoint(self, path):
+      ''' Restores the state saved by save_checkpoint, the next step continues the saved run '''
+      with numpy.load(path) as checkpoint:
+         genes, fitness = checkpoint["genes"], checkpoint["fitness"]
+         if (self.config["engine"] in ("array", "packed")):
+            self.genes, self.fitness = genes, fitness
+            self.chromosomeSize = checkpoint["chromosomeSize"].item()
+         elif (self.config["engine"] == "ragged"):
+            self.genes, self.offsets, self.fitness = genes, checkpoint["offsets"], fitness
+         else:
+            self.population = decode_ragged(genes, checkpoint["offsets"], fitness, **self.config)
+         self.children = list()
+         self.worstHeap.clear()
+         self.bestIndividual = decode_individual(checkpoint["bestGenes"], checkpoint["bestFitness"], **self.config)
+         self.generationNumber = checkpoint["generationNumber"].item()
+         self.rng.bit_generator.state = json.loads(checkpoint["randomState"].item())
+         if ("evaluated" in checkpoint.files):
+            self.evaluated.set_state(checkpoint["evaluated"])
+
+         self.surrogate = None
+         self.start_surrogate()
+         if (self.surrogate is not None and "surrogateFitness" in checkpoint.files):
+            self.surrogate.set_state(checkpoint["surrogateGenes"], checkpoint["surrogateFitness"],
+                                     checkpoint["surrogateCounters"])
+         elif (self.surrogate is not None):
+            # Checkpoints without a surrogate: it learns the population
+            self.learn(self.genes, self.fitness)
+
+      self.start_executor()
+      if (self.config["cacheSize"] > 0 and self.cache is None):
+         self.cache = FitnessCache(self.config["cacheSize"])
 
    def get_population(self):
-      return (self.population)
+      '''   Copy of the population sorted best first, the population itself keeps its order
+            (steady state reduction and seeded runs depend on it)
+      '''
+      if (self.config["engine"] in ("array", "packed")):
+         genes, fitness = sort_population_array(self.genes, self.fitness)
+         return decode_population(self.unpack(genes), fitness, **self.config)
+      elif (self.config["engine"] == "ragged"):
+         order = numpy.argsort(-self.fitness, kind="stable")
+         genes, offsets = ragged_take(self.genes, self.offsets, order)
+         return decode_ragged(genes, offsets, self.fitness[order], **self.config)
+      return [dict(individual, chromosome=list(individual["chromosome"]))
+              for individual in sorted(self.population, key = lambda k: k['fitness'], reverse=True)]
       
    def get_statistics(self):
-      generation = self.generationNumber
-      mean = average(self.population)
-      max_ = self.population[0]["fitness"]
-      min_ = self.population[-1]["fitness"]
-      sigma2 = variance(self.population, mean=mean)
-      
-      return {"generation": generation, "max": max_, "min": min_, "mean":mean, "variance":sigma2}
+      '''   generation, fitness max, min, mean, variance and quartiles (q25, q50, q75), diversity,
+            and aggregates of every fitness evaluated since initialize (evaluated*)
+      '''
+      if (self.config["engine"] in ("array", "packed", "ragged")):
+         fitness = self.fitness
+      else:
+         fitness = numpy.fromiter((individual["fitness"] for individual in self.population), dtype=float)
+
+      statistics = {"generation": self.generationNumber}
+      statistics.update(simpleGA_statistics.fitness_statistics(fitness))
+      if (self.config["diversitySample"] > 0):
+         statistics["diversity"] = self.get_diversity()
+      statistics.update(self.evaluated.as_dict("evaluated"))
+
+      if (self.cache is not None):
+         statistics["cacheHits"] = self.cache.hits
+         statistics["cacheMisses"] = self.cache.misses
+      if (self.surrogate is not None):
+         statistics.update(self.surrogate.accuracy())
+      if (self.config["profile"]):
+         statistics["phases"] = dict(self.phaseSeconds)
+         statistics["generationPhases"] = dict(self.generationPhaseSeconds)
+         statistics["evaluations"] = self.evaluations
+      return statistics
+
+   def get_diversity(self):
+      '''   Mean pairwise Hamming distance of diversitySample random individuals divided by the chromosome size,
+            None for chromosomes of different lengths
+      '''
+      sampleSize = self.config["diversitySample"]
+      if (self.config["engine"] in ("array", "packed")):
+         rows = simpleGA_statistics.sample_rows(len(self.fitness), sampleSize, self.statisticsRng)
+         genes = self.unpack(self.genes[rows])
+      elif (self.config["engine"] == "ragged"):
+         lengths = numpy.diff(self.offsets)
+         if ((lengths != lengths[0]).any()):
+            return None
+         rows = simpleGA_statistics.sample_rows(len(lengths), sampleSize, self.statisticsRng)
+         genes = self.genes.reshape(len(lengths), lengths[0])[rows]
+      else:
+         rows = simpleGA_statistics.sample_rows(len(self.population), sampleSize, self.statisticsRng)
+         sample = [self.population[i]["chromosome"] for i in rows]
+         if (len(set(map(len, sample))) > 1):
+            return None
+         genes = encode_genes(sample, **self.config)
+      return simpleGA_statistics.hamming_diversity(genes)
 
    def get_bestIndividual(self):
       return self.bestIndividual
 
+   def get_individual(self, i):
+      ''' Individual i of a ragged population '''
+      genes = self.genes[self.offsets[i]:self.offsets[i + 1]]
+      return decode_individual(genes, self.fitness[i], **self.config)
+
+   def get_emigrants(self, size):
+      ''' Copies of the best size individuals '''
+      if (self.config["engine"] in ("array", "packed")):
+         best = best_indexes_array(self.fitness, size)
+         return decode_population(self.unpack(self.genes[best]), self.fitness[best], **self.config)
+      elif (self.config["engine"] == "ragged"):
+         return [self.get_individual(i) for i in best_indexes_array(self.fitness, size)]
+      return [dict(individual) for individual in best_individuals(self.population, size)]
+
+   def immigrate(self, individuals):
+      ''' Replaces the worst individuals of the population with the given ones '''
+      if (not individuals):
+         return
+      self.worstHeap.clear()
+      if (self.config["engine"] in ("array", "packed")):
+         genes, fitness = encode_population(individuals, **self.config)
+         genes = self.pack(genes)
+         worst = worst_indexes_array(self.fitness, len(genes))
+         self.genes[worst] = genes[:len(worst)]
+         self.fitness[worst] = fitness[:len(worst)]
+      elif (self.config["engine"] == "ragged"):
+         genes, offsets, fitness = encode_ragged(individuals, **self.config)
+         worst = worst_indexes_array(self.fitness, len(fitness))
+         numbers = numpy.arange(len(self.fitness))
+         numbers[worst] = len(self.fitness) + numpy.arange(len(worst))
+         self.genes, self.offsets = ragged_take(*ragged_concatenate(self.genes, self.offsets, genes, offsets), numbers)
+         self.fitness[worst] = fitness[:len(worst)]
+      else:
+         for i, individual in zip(worst_indexes(self.population, len(individuals)), individuals):
+            self.population[i] = dict(individual)
+
+      best = max(individuals, key=lambda individual: individual["fitness"])
+      if (best["fitness"] > self.bestIndividual["fitness"]):
+         self.bestIndividual = dict(best)
+
 # ------------------------------------------------------------------------------------------------------------
 
 # ------------------------------------------------------------------------------------------------------------
@@ -497,11 +2102,12 @@ class Algorithm(object):
 # ------------------------------------------------------------------------------------------------------------
 
 
-logging.basicConfig(level = logging.DEBUG, format="%(asctime)s: %(levelname)-8s > %(message)s", datefmt="%I:%M:%S")
+# Applications configure logging, importing simpleGA leaves it untouched
+logger = logging.getLogger(__name__)
+
 if __name__ == '__main__':
-   logging.debug('starting as program')
-else:
-   logging.debug('starting as library')
+   logging.basicConfig(level = logging.DEBUG, format="%(asctime)s: %(levelname)-8s > %(message)s", datefmt="%I:%M:%S")
+   logger.debug('starting as program')
 
 
 
@@ -0,0 +1,180 @@
+#!/usr/bin/python3
+
+'''
+title:            simpleGA_benchmark
+description:      Benchmark of simpleGA.Algorithm over population sizes, chromosome sizes,
+                  gene types, engines and operator mixes
+
+execution:        ./simpleGA_benchmark.py --output results.json
+                  ./simpleGA_benchmark.py --quick --baseline baseline.json
+                  ./simpleGA_benchmark.py --save-baseline baseline.json
+
+results:          generationsPerSecond:  steps per second after initialize
+                  phases:                seconds spent in every phase over all the steps (Algorithm profile)
+                  evaluations:           chromosomes evaluated, initialize included
+                  peakMemory:            bytes, peak traced by tracemalloc in initialize and one step
+'''
+
+import argparse
+import itertools
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy
+
+import simpleGA
+
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# GRID
+# ------------------------------------------------------------------------------------------------------------
+
+GRID = {"populationSize": [100, 1000, 10000],
+        "chromosomeSize": [10, 100],
+        "geneType": ['Z', 'R'],
+        "engine": ["dict", "array", "packed"],
+        "operators": ["roulette-onepoint-uniform", "tournament-twopoint-flipbit", "rank-uniform-boundary"]}
+
+QUICK_GRID = {"populationSize": [100, 1000],
+              "chromosomeSize": [10],
+              "geneType": ['Z'],
+              "engine": ["dict", "array"],
+              "operators": ["roulette-onepoint-uniform"]}
+
+
+def fitness_batch(chromosomes):
+   ''' Cheap fitness so the benchmark measures the algorithm: sum of the genes '''
+   return chromosomes.sum(axis=1)
+
+
+def case_config(populationSize, chromosomeSize, geneType, engine, operators, seed):
+   selectionType, crossoverType, mutationType = operators.split("-")
+   return {"populationMin": populationSize, "populationMax": populationSize,
+           "chromosomeMin": chromosomeSize, "chromosomeMax": chromosomeSize,
+           "geneType": geneType, "geneMin": 0, "geneMax": 1 if mutationType == "flipbit" else 9,
+           "selectionType": selectionType,
+           "crossoverType": crossoverType, "crossoverMin": populationSize // 2, "crossoverMax": populationSize // 2,
+           "mutationType": mutationType, "mutationGeneRate": 0.01,
+           "reductionType": "roulette",
+           "evaluationType": "batch", "evaluationFunction": fitness_batch,
+           "engine": engine, "profile": True, "seed": seed}
+
+
+def case_name(populationSize, chromosomeSize, geneType, engine, operators):
+   return "{}-{}x{}-{}-{}".format(engine, populationSize, chromosomeSize, geneType, operators)
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# RUN
+# ------------------------------------------------------------------------------------------------------------
+
+def run_case(config, generations):
+   ga = simpleGA.Algorithm(config)
+   start = time.perf_counter()
+   ga.initialize()
+   initializeSeconds = time.perf_counter() - start
+   initializePhases = ga.get_statistics()["phases"]
+
+   start = time.perf_counter()
+   for generation in range(generations):
+      ga.step()
+   stepSeconds = time.perf_counter() - start
+
+   statistics = ga.get_statistics()
+   phases = {phase: seconds - initializePhases.get(phase, 0.0) for phase, seconds in statistics["phases"].items()}
+   best = ga.get_bestIndividual()["fitness"]
+   ga.close()
+
+   # Separate run, tracemalloc slows every allocation down
+   tracemalloc.start()
+   memoryGa = simpleGA.Algorithm(config)
+   memoryGa.initialize()
+   memoryGa.step()
+   peakMemory = tracemalloc.get_traced_memory()[1]
+   tracemalloc.stop()
+   memoryGa.close()
+
+   return {"generationsPerSecond": generations / stepSeconds,
+           "initializeSeconds": initializeSeconds,
+           "phases": phases,
+           "evaluations": statistics["evaluations"],
+           "peakMemory": peakMemory,
+           "best": best}
+
+
+def run_grid(grid, generations, seed):
+   results = dict()
+   keys = list(grid)
+   for values in itertools.product(*(grid[key] for key in keys)):
+      case = dict(zip(keys, values))
+      name = case_name(**case)
+      results[name] = dict(case, **run_case(case_config(seed=seed, **case), generations))
+      print("{:<60} {:>10.2f} gen/s {:>12,d} B".format(
+         name, results[name]["generationsPerSecond"], results[name]["peakMemory"]), file=sys.stderr)
+   return results
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# BASELINE
+# ------------------------------------------------------------------------------------------------------------
+
+def compare(results, baseline, tolerance):
+   '''   Cases at least tolerance (ex: 0.2 is 20%) slower or bigger than in the baseline /
+            returns a list of (case, metric, baselineValue, value)
+   '''
+   regressions = []
+   for name, result in results.items():
+      if (name not in baseline):
+         continue
+      old = baseline[name]
+      if (result["generationsPerSecond"] < old["generationsPerSecond"] * (1 - tolerance)):
+         regressions.append((name, "generationsPerSecond", old["generationsPerSecond"], result["generationsPerSecond"]))
+      if (result["peakMemory"] > old["peakMemory"] * (1 + tolerance)):
+         regressions.append((name, "peakMemory", old["peakMemory"], result["peakMemory"]))
+   return regressions
+
+
+def main():
+   parser = argparse.ArgumentParser(description="simpleGA benchmark")
+   parser.add_argument("--quick", action="store_true", help="small grid")
+   parser.add_argument("--generations", type=int, default=10)
+   parser.add_argument("--seed", type=int, default=0)
+   parser.add_argument("--output", help="json file with the results")
+   parser.add_argument("--baseline", help="json file of a previous run to compare with")
+   parser.add_argument("--save-baseline", help="json file where the results are saved as baseline")
+   parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, 0.2 is 20%%")
+   arguments = parser.parse_args()
+
+   results = run_grid(QUICK_GRID if arguments.quick else GRID, arguments.generations, arguments.seed)
+   report = {"python": platform.python_version(), "numpy": numpy.__version__,
+             "machine": platform.machine(), "generations": arguments.generations,
+             "seed": arguments.seed, "cases": results}
+
+   for path in (arguments.output, arguments.save_baseline):
+      if (path):
+         with open(path, "w") as output:
+            json.dump(report, output, indent=2)
+
+   if (arguments.baseline):
+      with open(arguments.baseline) as baselineFile:
+         baseline = json.load(baselineFile)["cases"]
+      regressions = compare(results, baseline, arguments.tolerance)
+      for name, metric, old, new in regressions:
+         print("REGRESSION {} {}: {:.4g} -> {:.4g}".format(name, metric, old, new))
+      if (regressions):
+         sys.exit(1)
+      print("No regressions against {}".format(arguments.baseline))
+
+
+if __name__ == '__main__':
+   main()
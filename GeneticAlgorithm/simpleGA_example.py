@@ -14,6 +14,8 @@ Execution:        ./simpleGA_example.py
 
 import simpleGA
 import functools
+import numpy
+import asyncio
 
 
 
@@ -37,6 +39,15 @@ def fitness_individual(individual):
    individual["fitness"] = functools.reduce(lambda x, y: 2*x+y, individual["chromosome"])
 
 
+def fitness_batch(chromosomes):
+   return chromosomes @ (2 ** numpy.arange(chromosomes.shape[1] - 1, -1, -1))
+
+
+async def fitness_async(chromosome):
+   await asyncio.sleep(0.01)     # a request to a simulation service
+   return functools.reduce(lambda x, y: 2*x+y, chromosome)
+
+
 # ------------------------------------------------------------------------------------------------------------
 
 # ------------------------------------------------------------------------------------------------------------
@@ -54,7 +65,10 @@ config = {  "populationMin": 6, "populationMax": 8,
             "evaluationType": "chromosome", "evaluationFunction": fitness_chromosome,
             #"evaluationType": "population", "evaluationFunction": fitness_population,
             #"evaluationType": "individual", "evaluationFunction": fitness_individual,
+            #"evaluationType": "batch", "evaluationFunction": fitness_batch,
+            #"evaluationType": "async", "evaluationFunction": fitness_async, "evaluationConcurrency": 8,
             #"evaluationType": "test",
+            #"telemetryPath": "simpleGA_telemetry.jsonl", "telemetryFormat": "jsonl",
             "stopType": "generation", "stopValue":50}
    
 
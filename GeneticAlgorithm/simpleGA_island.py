@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+
+'''
+title:            simpleGA_island
+description:      Island model: several simpleGA populations evolving in their own process
+                  and exchanging their best individuals every few generations
+
+configuration:
+                  islands:             Number of islands (processes)
+                  migrationInterval:   Generations evolved by every island between migrations
+                  migrationSize:       Best individuals sent by every island in a migration
+                  topology:            {ring, full}  ring: to the next island, full: to every other island
+                  seed:                Seed from where every island gets an independent random stream
+                  Every other element is the configuration of the simpleGA.Algorithm of each island
+'''
+
+import multiprocessing
+import numpy
+
+import simpleGA
+
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# TOPOLOGY
+# ------------------------------------------------------------------------------------------------------------
+
+def topology(emigrants, topologyType, migrationSize, **rest):
+   '''   Returns the immigrants of every island from the emigrants of every island
+            topologyType E {ring, full}
+   '''
+   if (topologyType == "ring"):
+      return topology_ring(emigrants)
+   elif (topologyType == "full"):
+      return topology_full(emigrants, migrationSize)
+   else:
+      raise simpleGA.CustomException("topology not implemented")
+
+
+def topology_ring(emigrants):
+   ''' Island i receives from island i-1 '''
+   return [emigrants[i - 1] for i in range(len(emigrants))]
+
+
+def topology_full(emigrants, migrationSize):
+   ''' Island i receives the best migrationSize individuals of the other islands '''
+   immigrants = []
+   for i in range(len(emigrants)):
+      others = [individual for j, group in enumerate(emigrants) if j != i for individual in group]
+      others.sort(key=lambda individual: individual["fitness"], reverse=True)
+      immigrants.append(others[:migrationSize])
+   return immigrants
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# ISLAND PROCESS
+# ------------------------------------------------------------------------------------------------------------
+
+def island_worker(connection, config):
+   '''   Evolves one simpleGA.Algorithm on orders from the IslandModel
+            order: (generations, immigrants) -> answer: (statistics, bestIndividual, emigrants)
+            order: None -> stops
+   '''
+   migrationSize = config["migrationSize"]
+
+   ga = simpleGA.Algorithm(config)
+   ga.initialize()
+   connection.send((ga.get_statistics(), ga.get_bestIndividual(), ga.get_emigrants(migrationSize)))
+   while True:
+      order = connection.recv()
+      if (order is None):
+         break
+
+      generations, immigrants = order
+      ga.immigrate(immigrants)
+      for generation in range(generations):
+         ga.step()
+      connection.send((ga.get_statistics(), ga.get_bestIndividual(), ga.get_emigrants(migrationSize)))
+
+   ga.close()
+   connection.close()
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# ISLAND MODEL CLASS
+# ------------------------------------------------------------------------------------------------------------
+
+class IslandModel(object):
+
+   # Default configuration, the rest goes to every island
+   config = {  "islands": 4,
+               "migrationInterval": 10, "migrationSize": 2,
+               "topology": "ring", "seed": None}
+
+   def __init__(self, config):
+      self.config = dict(self.config)
+      self.config.update(config)
+
+      self.processes = list()
+      self.connections = list()
+      self.islandStatistics = list()
+      self.bestIndividual = dict()
+      self.emigrants = list()
+      self.generationNumber = 0
+
+   def initialize(self):
+      # One child of the seed for every island: independent and reproducible streams
+      seeds = numpy.random.SeedSequence(self.config["seed"]).spawn(self.config["islands"])
+      for seed in seeds:
+         parent, child = multiprocessing.Pipe()
+         islandConfig = dict(self.config, seed=seed)
+         process = multiprocessing.Process(target=island_worker, args=(child, islandConfig), daemon=True)
+         process.start()
+         child.close()
+         self.processes.append(process)
+         self.connections.append(parent)
+
+      self.collect()
+      self.generationNumber = 1
+
+   def step(self):
+      ''' Evolves every island migrationInterval generations, sending first the last emigrants '''
+      immigrants = topology(self.emigrants, self.config["topology"], **self.config)
+      for connection, group in zip(self.connections, immigrants):
+         connection.send((self.config["migrationInterval"], group))
+
+      self.collect()
+      self.generationNumber += self.config["migrationInterval"]
+
+   def collect(self):
+      answers = [connection.recv() for connection in self.connections]
+      self.islandStatistics = [statistics for statistics, best, emigrants in answers]
+      self.emigrants = [emigrants for statistics, best, emigrants in answers]
+
+      for statistics, best, emigrants in answers:
+         if (not self.bestIndividual or best["fitness"] > self.bestIndividual["fitness"]):
+            self.bestIndividual = best
+
+   def close(self):
+      for connection in self.connections:
+         connection.send(None)
+         connection.close()
+      for process in self.processes:
+         process.join()
+      self.processes = list()
+      self.connections = list()
+
+   def get_statistics(self):
+      return {"generation": self.generationNumber,
+              "max": max(statistics["max"] for statistics in self.islandStatistics),
+              "min": min(statistics["min"] for statistics in self.islandStatistics),
+              "islands": self.islandStatistics}
+
+   def get_bestIndividual(self):
+      return self.bestIndividual
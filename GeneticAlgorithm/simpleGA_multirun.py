@@ -0,0 +1,306 @@
+#!/usr/bin/python3
+
+'''
+title:            simpleGA_multirun
+description:      Many independent simpleGA runs evolved together: the population of every run is
+                  stacked in a 3D genes array (runs x individuals x genes) and a 2D fitness array
+                  (runs x individuals), and every operator works on all the runs at once;
+                  only the random draws are made run by run, every run from its own generator
+
+configuration:
+                  runs:                Number of independent runs
+                  Every other element as in simpleGA.Algorithm, with the array engine
+                  populationMin/Max and chromosomeMin/Max: one size is drawn for all the runs
+                  reductionType:       {survivalChildren, roulette}
+                  seed:                Every run draws from its own generator (SeedSequence(seed).spawn(runs)),
+                                       so run r is the same whatever the number of runs; the sizes shared
+                                       by all the runs (population, chromosome, crossovers) come from
+                                       default_rng(seed)
+'''
+
+import time
+import concurrent.futures
+import numpy
+
+import simpleGA
+
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# SELECTION
+# ------------------------------------------------------------------------------------------------------------
+
+def random_runs(rngs, draw):
+   ''' draw(rng) with the generator of every run, stacked (runs x ...) '''
+   return numpy.stack([draw(rng) for rng in rngs])
+
+
+def selection_runs(fitness, size, selectionType, rngs, **rest):
+   '''   Returns size indexes per run (runs x size) of individuals chosen for reproduction
+            selectionType E {roulette, truncation, rank, tournament}
+   '''
+   if (selectionType == "roulette"):
+      return selection_roulette_runs(fitness, size, rngs)
+   elif (selectionType == "truncation"):
+      return selection_truncation_runs(fitness, size, rngs, **rest)
+   elif (selectionType == "rank"):
+      return selection_rank_runs(fitness, size, rngs)
+   elif (selectionType == "tournament"):
+      return selection_tournament_runs(fitness, size, rngs, **rest)
+   else:
+      raise simpleGA.CustomException("selectionType not implemented")
+
+
+def selection_roulette_runs(fitness, size, rngs):
+   '''   Roulette of every run in one search: the cumulative table of run r is scaled to (r, r+1]
+         so all the tables can be searched as one sorted array
+   '''
+   runs, individuals = fitness.shape
+   fitness = fitness - numpy.minimum(fitness.min(axis=1, keepdims=True), 0)
+   table = numpy.cumsum(fitness, axis=1)
+   total = table[:, -1:]
+   table = numpy.where(total > 0, table / numpy.where(total > 0, total, 1),
+                       numpy.arange(1, individuals + 1) / individuals)
+   table = table + numpy.arange(runs)[:, None]
+
+   randomVal = random_runs(rngs, lambda rng: rng.random(size)) + numpy.arange(runs)[:, None]
+   positions = table.ravel().searchsorted(randomVal.ravel()).reshape(runs, size)
+   return numpy.minimum(positions - numpy.arange(runs)[:, None] * individuals, individuals - 1)
+
+
+def selection_truncation_runs(fitness, size, rngs, truncationRate, **rest):
+   runs, individuals = fitness.shape
+   best = max(1, int(individuals * truncationRate))
+   candidates = numpy.argpartition(-fitness, best - 1, axis=1)[:, :best]
+   return numpy.take_along_axis(candidates, random_runs(rngs, lambda rng: rng.integers(0, best, size)), axis=1)
+
+
+def selection_rank_runs(fitness, size, rngs):
+   runs, individuals = fitness.shape
+   order = numpy.argsort(fitness, axis=1, kind="stable")
+   table = numpy.cumsum(numpy.arange(1.0, individuals + 1))
+   randomVal = random_runs(rngs, lambda rng: rng.uniform(0, table[-1], size))
+   positions = numpy.minimum(table.searchsorted(randomVal), individuals - 1)
+   return numpy.take_along_axis(order, positions, axis=1)
+
+
+def selection_tournament_runs(fitness, size, rngs, tournamentSize, **rest):
+   runs, individuals = fitness.shape
+   competitors = random_runs(rngs, lambda rng: rng.integers(0, individuals, (size, tournamentSize)))
+   competitorFitness = numpy.take_along_axis(fitness[:, :, None], competitors, axis=1)
+   winners = competitorFitness.argmax(axis=2)
+   return numpy.take_along_axis(competitors, winners[:, :, None], axis=2)[:, :, 0]
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# CROSSOVER, MUTATION AND REDUCTION
+# ------------------------------------------------------------------------------------------------------------
+
+def take_runs(genes, indexes):
+   ''' genes[r, indexes[r]] for every run r '''
+   return numpy.take_along_axis(genes, indexes[:, :, None], axis=1)
+
+
+def crossover_runs(genes, fitness, crossoverType, selectionType, crossoverMin, crossoverMax, rng, rngs, **rest):
+   '''   Returns the children of every run (runs x children x genes),
+         crossTimes is drawn from the shared rng and the rest from the generator of every run
+            crossoverType E {onepoint, twopoint, uniform}
+   '''
+   crossoverMask = simpleGA.crossover_mask(crossoverType)
+
+   runs, individuals, chromosomeSize = genes.shape
+   crossTimes = rng.integers(crossoverMin, crossoverMax, endpoint=True)
+   parents = selection_runs(fitness, 2 * crossTimes, selectionType, rngs, **rest)
+   fathers = take_runs(genes, parents[:, 0::2])
+   mothers = take_runs(genes, parents[:, 1::2])
+   masks = random_runs(rngs, lambda runRng: crossoverMask(crossTimes, chromosomeSize, runRng))
+
+   children = numpy.empty((runs, 2 * crossTimes, chromosomeSize), dtype=genes.dtype)
+   children[:, 0::2] = numpy.where(masks, fathers, mothers)
+   children[:, 1::2] = numpy.where(masks, mothers, fathers)
+   return children
+
+
+def mutation_runs(children, mutationType, mutationGeneRate, geneType, geneMin, geneMax, geneChoice, rngs, **rest):
+   '''   Mutates the children of every run in place with one masked assignment, the mask and the new
+         values of every run are drawn from its own generator
+            mutationType E {flipbit, boundary, uniform}
+   '''
+   shape = children.shape[1:]
+   low, high = simpleGA.gene_bounds(geneType, geneMin, geneMax, geneChoice)
+   mask = random_runs(rngs, lambda rng: simpleGA.mutation_mask(shape, mutationGeneRate, rng))
+   if (mutationType == 'flipbit'):
+      values = low + high - children
+   elif (mutationType == 'boundary'):
+      values = numpy.where(random_runs(rngs, lambda rng: rng.random(shape) < 0.5), low, high)
+   elif (mutationType == 'uniform'):
+      values = random_runs(rngs, lambda rng: simpleGA.gene_generator_array(shape, geneType, geneMin, geneMax,
+                                                                           geneChoice, rng))
+   else:
+      raise simpleGA.CustomException("mutationType not implemented")
+   children[mask] = values[mask]
+
+
+def reduction_runs(genes, fitness, childGenes, childFitness, reductionType, **rest):
+   '''   Returns genes and fitness of the next generation of every run
+            reductionType E {survivalChildren, roulette}
+   '''
+   if (reductionType == "survivalChildren"):
+      return reduction_survivalChildren_runs(genes, fitness, childGenes, childFitness, **rest)
+   elif (reductionType == "roulette"):
+      return reduction_roulette_runs(genes, fitness, childGenes, childFitness, **rest)
+   else:
+      raise simpleGA.CustomException("reductionType not implemented")
+
+
+def best_runs(fitness, size):
+   ''' Indexes of the best size individuals of every run, in any order '''
+   if (size >= fitness.shape[1]):
+      return numpy.broadcast_to(numpy.arange(fitness.shape[1]), fitness.shape)
+   return numpy.argpartition(-fitness, size - 1, axis=1)[:, :size]
+
+
+def reduction_survivalChildren_runs(genes, fitness, childGenes, childFitness, populationMin, populationMax, **rest):
+   '''   Only children survives, the best ones when there are more than populationMax
+         and the best of the population fill up to populationMin
+   '''
+   if (childGenes.shape[1] > populationMax):
+      best = best_runs(childFitness, populationMax)
+      return take_runs(childGenes, best), numpy.take_along_axis(childFitness, best, axis=1)
+
+   if (childGenes.shape[1] < populationMin):
+      best = best_runs(fitness, populationMin - childGenes.shape[1])
+      return (numpy.concatenate((childGenes, take_runs(genes, best)), axis=1),
+              numpy.concatenate((childFitness, numpy.take_along_axis(fitness, best, axis=1)), axis=1))
+
+   return childGenes, childFitness
+
+
+def reduction_roulette_runs(genes, fitness, childGenes, childFitness, populationMin, populationMax, rng, rngs,
+                            **rest):
+   '''   Chooses by roulette half from population and half children, the same size (from rng) in every run '''
+   newPopulationSize = rng.integers(populationMin, populationMax, endpoint=True)
+   fromPopulation = selection_roulette_runs(fitness, (newPopulationSize + 1) // 2, rngs)
+   fromChildren = selection_roulette_runs(childFitness, newPopulationSize // 2, rngs)
+
+   return (numpy.concatenate((take_runs(genes, fromPopulation), take_runs(childGenes, fromChildren)), axis=1),
+           numpy.concatenate((numpy.take_along_axis(fitness, fromPopulation, axis=1),
+                              numpy.take_along_axis(childFitness, fromChildren, axis=1)), axis=1))
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# MULTI RUN CLASS
+# ------------------------------------------------------------------------------------------------------------
+
+class MultiAlgorithm(object):
+
+   # Default configuration
+   config = dict(simpleGA.Algorithm.config, runs=8, engine="array")
+
+   def __init__(self, config):
+      self.config = dict(self.config)
+      for key in config:
+         if key in self.config:
+            self.config[key] = config[key]
+
+      self.genes = None
+      self.fitness = None
+      self.bestGenes = None
+      self.bestFitness = None
+      self.generationNumber = 0
+      self.executor = None
+
+      # Sizes shared by every run and one independent generator per run
+      self.rng = numpy.random.default_rng(self.config["seed"])
+      self.rngs = [numpy.random.default_rng(seed)
+                   for seed in numpy.random.SeedSequence(self.config["seed"]).spawn(self.config["runs"])]
+
+   def start_executor(self):
+      if (self.config["evaluationType"] == "parallel" and self.executor is None):
+         self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.config["evaluationWorkers"])
+
+   def close(self):
+      ''' Stops the process pool of parallel evaluation '''
+      if (self.executor is not None):
+         self.executor.shutdown()
+         self.executor = None
+
+   def evaluate(self, genes):
+      ''' Every run is evaluated in one call, flattened to (runs * individuals) x genes '''
+      runs, individuals, chromosomeSize = genes.shape
+      fitness = simpleGA.evaluation_array(genes.reshape(runs * individuals, chromosomeSize),
+                                          executor=self.executor, **self.config)
+      return fitness.reshape(runs, individuals)
+
+   def initialize(self):
+      self.start_executor()
+      populationSize = self.rng.integers(self.config["populationMin"], self.config["populationMax"], endpoint=True)
+      chromosomeSize = self.rng.integers(self.config["chromosomeMin"], self.config["chromosomeMax"], endpoint=True)
+
+      self.generationNumber = 1
+      self.genes = random_runs(self.rngs, lambda rng: simpleGA.gene_generator_array(
+         (populationSize, chromosomeSize), rng=rng, **self.config))
+      self.fitness = self.evaluate(self.genes)
+
+      best = self.fitness.argmax(axis=1)
+      self.bestGenes = self.genes[numpy.arange(len(best)), best]
+      self.bestFitness = self.fitness[numpy.arange(len(best)), best]
+
+   def step(self):
+      childGenes = crossover_runs(self.genes, self.fitness, rng=self.rng, rngs=self.rngs, **self.config)
+      mutation_runs(childGenes, rngs=self.rngs, **self.config)
+      childFitness = self.evaluate(childGenes)
+
+      self.genes, self.fitness = reduction_runs(self.genes, self.fitness, childGenes, childFitness,
+                                                rng=self.rng, rngs=self.rngs, **self.config)
+
+      best = self.fitness.argmax(axis=1)
+      bestFitness = self.fitness[numpy.arange(len(best)), best]
+      improved = bestFitness > self.bestFitness
+      self.bestGenes[improved] = self.genes[numpy.arange(len(best)), best][improved]
+      self.bestFitness[improved] = bestFitness[improved]
+
+      self.generationNumber += 1
+
+   def run(self):
+      '''   Steps until the stop configuration is reached, best fitness and stagnation are those
+            of the best run
+      '''
+      start = time.perf_counter()
+      if (self.generationNumber == 0):
+         self.initialize()
+
+      best = self.bestFitness.max()
+      stagnation = 0
+      while True:
+         statistics = {"generation": self.generationNumber, "best": self.bestFitness.max().item(),
+                       "elapsed": time.perf_counter() - start, "stagnation": stagnation}
+         if (simpleGA.stop(statistics, **self.config)):
+            return self.get_bestIndividuals()
+
+         self.step()
+         if (self.bestFitness.max() > best):
+            best = self.bestFitness.max()
+            stagnation = 0
+         else:
+            stagnation += 1
+
+   def get_statistics(self):
+      ''' Statistics of every run, lists with one value per run '''
+      mean = self.fitness.mean(axis=1)
+      return {"generation": self.generationNumber,
+              "max": self.fitness.max(axis=1).tolist(), "min": self.fitness.min(axis=1).tolist(),
+              "mean": mean.tolist(), "best": self.bestFitness.tolist()}
+
+   def get_bestIndividuals(self):
+      ''' Best individual of every run '''
+      return simpleGA.decode_population(self.bestGenes, self.bestFitness, **self.config)
+
+   def get_population(self, run):
+      return simpleGA.decode_population(self.genes[run], self.fitness[run], **self.config)
@@ -0,0 +1,238 @@
+#!/usr/bin/python3
+
+'''
+title:            simpleGA_nsga2
+description:      Multi-objective simpleGA (NSGA-II): the fitness of every individual is a vector of
+                  objectives (all of them maximized), the population is ranked in Pareto fronts by a fast
+                  non-dominated sort and, inside a front, by crowding distance
+
+configuration:
+                  evaluationType:      {batch, chromosome}
+                                       batch: evaluationFunction gets a 2D array of chromosomes and returns a
+                                       2D array (chromosomes x objectives)
+                                       chromosome: evaluationFunction gets a chromosome and returns its objectives
+                  selectionType:       Always a crowded tournament of tournamentSize individuals:
+                                       lowest rank wins, highest crowding distance breaks ties
+                  reductionType:       Always the NSGA-II one: best fronts of population + children,
+                                       the last front that fits is cut by crowding distance
+                  stopType:            {generation, time, stagnation} or a list of them
+                                       stagnation: generations without a child in the first front
+                  Every other element as in simpleGA.Algorithm, with the array engine
+'''
+
+import time
+import numpy
+
+import simpleGA
+
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# EVALUATION
+# ------------------------------------------------------------------------------------------------------------
+
+def evaluation_objectives(genes, evaluationType, evaluationFunction, **rest):
+   '''   Returns the objectives array (chromosomes x objectives) of a genes array
+            evaluationType E {batch, chromosome}
+   '''
+   if (evaluationType == "batch"):
+      objectives = evaluationFunction(simpleGA.decode_genes(genes, **rest))
+   elif (evaluationType == "chromosome"):
+      objectives = [evaluationFunction(simpleGA.decode_chromosome(row, **rest)) for row in genes]
+   else:
+      raise simpleGA.CustomException("evaluationType not implemented")
+   return numpy.asarray(objectives, dtype=float).reshape(len(genes), -1)
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# PARETO RANKING
+# ------------------------------------------------------------------------------------------------------------
+
+def domination_matrix(objectives):
+   '''   dominates[i, j] True: i is at least as good as j in every objective and better in one /
+            built one objective at a time in two N x N accumulators
+   '''
+   size = len(objectives)
+   atLeast = numpy.ones((size, size), dtype=bool)
+   better = numpy.zeros((size, size), dtype=bool)
+   for column in objectives.T:
+      atLeast &= column[:, None] >= column
+      better |= column[:, None] > column
+   atLeast &= better
+   return atLeast
+
+
+def non_dominated_sort(objectives):
+   '''   Fast non-dominated sort, returns the front of every individual (0: not dominated) /
+            every front is removed at once: the individuals it dominates lose one domination each
+   '''
+   dominates = domination_matrix(objectives)
+   dominatedBy = dominates.sum(axis=0)
+   ranks = numpy.full(len(objectives), -1)
+
+   rank = 0
+   front = dominatedBy == 0
+   while (front.any()):
+      ranks[front] = rank
+      dominatedBy = dominatedBy - dominates[front].sum(axis=0)
+      dominatedBy[ranks >= 0] = -1
+      front = dominatedBy == 0
+      rank += 1
+   return ranks
+
+
+def crowding_distance(objectives, ranks):
+   '''   Crowding distance of every individual inside its front, one sort per objective for all fronts /
+            sum over objectives of the gap between both neighbours divided by the range of the front,
+            the extremes of a front are infinite
+   '''
+   size, objectiveCount = objectives.shape
+   distance = numpy.zeros(size)
+   if (size == 0):
+      return distance
+
+   for objective in range(objectiveCount):
+      order = numpy.lexsort((objectives[:, objective], ranks))
+      values = objectives[order, objective]
+      fronts = ranks[order]
+
+      first = numpy.r_[True, fronts[1:] != fronts[:-1]]
+      last = numpy.r_[fronts[1:] != fronts[:-1], True]
+      starts = numpy.flatnonzero(first)
+      lengths = numpy.diff(numpy.r_[starts, size])
+      span = numpy.repeat(numpy.maximum.reduceat(values, starts) - numpy.minimum.reduceat(values, starts), lengths)
+
+      gap = numpy.zeros(size)
+      gap[1:-1] = values[2:] - values[:-2]
+      gap = numpy.divide(gap, span, out=numpy.zeros(size), where=span > 0)
+      gap[first | last] = numpy.inf
+      distance[order] += gap
+   return distance
+
+
+def crowded_order(ranks, crowding):
+   ''' Indexes from best to worst: lower rank first, then higher crowding distance '''
+   return numpy.lexsort((-crowding, ranks))
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# SELECTION AND REDUCTION
+# ------------------------------------------------------------------------------------------------------------
+
+def selection_crowded_tournament(ranks, crowding, size, tournamentSize, rng, **rest):
+   ''' size indexes, every one the best by crowded_order of tournamentSize random individuals '''
+   position = numpy.empty(len(ranks), dtype=numpy.int64)
+   position[crowded_order(ranks, crowding)] = numpy.arange(len(ranks))
+
+   competitors = rng.integers(0, len(ranks), (size, tournamentSize))
+   winners = position[competitors].argmin(axis=1)
+   return competitors[numpy.arange(size), winners]
+
+
+def crossover_nsga2(genes, ranks, crowding, crossoverType, crossoverMin, crossoverMax, rng, **rest):
+   '''   Returns the children genes array, parents chosen by crowded tournament
+            crossoverType E {onepoint, twopoint, uniform}
+   '''
+   crossTimes = rng.integers(crossoverMin, crossoverMax, endpoint=True)
+   pairs = selection_crowded_tournament(ranks, crowding, 2 * crossTimes, rng=rng, **rest).reshape(crossTimes, 2)
+   masks = simpleGA.crossover_mask(crossoverType)(crossTimes, genes.shape[1], rng)
+   return simpleGA.crossover_pairs_array(genes, pairs, masks)
+
+
+def reduction_nsga2(genes, objectives, childGenes, childObjectives, populationMin, populationMax, rng, **rest):
+   '''   Best individuals of population + children by crowded_order, returns their genes, objectives,
+         ranks and crowding distances and whether a child reached the first front
+   '''
+   genes = numpy.concatenate((genes, childGenes))
+   objectives = numpy.concatenate((objectives, childObjectives))
+   ranks = non_dominated_sort(objectives)
+   crowding = crowding_distance(objectives, ranks)
+
+   newPopulationSize = rng.integers(populationMin, populationMax, endpoint=True)
+   survivors = crowded_order(ranks, crowding)[:newPopulationSize]
+   improved = bool((ranks[len(ranks) - len(childGenes):] == 0).any())
+   return genes[survivors], objectives[survivors], ranks[survivors], crowding[survivors], improved
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# NSGA-II CLASS
+# ------------------------------------------------------------------------------------------------------------
+
+class ParetoAlgorithm(object):
+
+   # Default configuration
+   config = dict(simpleGA.Algorithm.config, engine="array", evaluationType="batch", tournamentSize=2)
+
+   def __init__(self, config):
+      self.config = dict(self.config)
+      for key in config:
+         if key in self.config:
+            self.config[key] = config[key]
+
+      self.genes = None
+      self.objectives = None
+      self.ranks = None
+      self.crowding = None
+      self.improved = False
+      self.generationNumber = 0
+      self.rng = numpy.random.default_rng(self.config["seed"])
+
+   def initialize(self):
+      self.generationNumber = 1
+      self.genes = simpleGA.initialization_array(rng=self.rng, **self.config)
+      self.objectives = evaluation_objectives(self.genes, **self.config)
+      self.ranks = non_dominated_sort(self.objectives)
+      self.crowding = crowding_distance(self.objectives, self.ranks)
+
+   def step(self):
+      childGenes = crossover_nsga2(self.genes, self.ranks, self.crowding, rng=self.rng, **self.config)
+      simpleGA.mutation_array(childGenes, rng=self.rng, **self.config)
+      childObjectives = evaluation_objectives(childGenes, **self.config)
+
+      self.genes, self.objectives, self.ranks, self.crowding, self.improved = reduction_nsga2(
+         self.genes, self.objectives, childGenes, childObjectives, rng=self.rng, **self.config)
+
+      self.generationNumber += 1
+
+   def run(self):
+      ''' Steps until the stop configuration is reached and returns the first front '''
+      start = time.perf_counter()
+      if (self.generationNumber == 0):
+         self.initialize()
+
+      stagnation = 0
+      while True:
+         statistics = self.get_statistics()
+         statistics["elapsed"] = time.perf_counter() - start
+         statistics["stagnation"] = stagnation
+         if (simpleGA.stop(statistics, **self.config)):
+            return self.get_paretoFront()
+
+         self.step()
+         stagnation = 0 if self.improved else stagnation + 1
+
+   def get_statistics(self):
+      ''' Objectives statistics are lists with one value per objective '''
+      return {"generation": self.generationNumber,
+              "fronts": int(self.ranks.max()) + 1, "paretoSize": int((self.ranks == 0).sum()),
+              "max": self.objectives.max(axis=0).tolist(), "min": self.objectives.min(axis=0).tolist(),
+              "mean": self.objectives.mean(axis=0).tolist()}
+
+   def get_population(self):
+      ''' Population by crowded order, every individual with its objectives, rank and crowding distance '''
+      order = crowded_order(self.ranks, self.crowding)
+      return [{"chromosome": simpleGA.decode_chromosome(self.genes[i], **self.config),
+               "fitness": self.objectives[i].tolist(),
+               "rank": self.ranks[i].item(), "crowding": self.crowding[i].item()} for i in order]
+
+   def get_paretoFront(self):
+      ''' Individuals of the first front '''
+      return [individual for individual in self.get_population() if individual["rank"] == 0]
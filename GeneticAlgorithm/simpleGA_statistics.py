@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+
+'''
+title:            simpleGA_statistics
+description:      Population statistics of simpleGA in vectorized passes: fitness mean, variance, extremes
+                  and quantiles, genotype diversity (mean pairwise Hamming distance) and running
+                  aggregates over generations (Welford)
+
+statistics:
+                  mean:                Sum(xi) / n
+                  variance:            Sum((xi - mean)^2) / n
+                  qNN:                 NN percentile of the fitness, q50 is the median
+                  diversity:           Mean over every pair of individuals of the fraction of genes that differ,
+                                       0: every chromosome is the same, estimated on a random sample of
+                                       diversitySample individuals (simpleGA.Algorithm, opt-in)
+'''
+
+import numpy
+
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# FITNESS
+# ------------------------------------------------------------------------------------------------------------
+
+def fitness_statistics(fitness, quantiles=(0.25, 0.5, 0.75)):
+   '''   max, min, mean, variance and the quantiles (keys qNN) of a fitness array,
+         extremes and quantiles come from a single partition of the array
+   '''
+   fitness = numpy.asarray(fitness, dtype=float)
+   points = numpy.quantile(fitness, [0.0, 1.0] + list(quantiles)).tolist()
+   mean = fitness.mean()
+   statistics = {"max": points[1], "min": points[0],
+                 "mean": mean.item(), "variance": numpy.square(fitness - mean).mean().item()}
+   for quantile, value in zip(quantiles, points[2:]):
+      statistics["q{:g}".format(100 * quantile)] = value
+   return statistics
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# DIVERSITY
+# ------------------------------------------------------------------------------------------------------------
+
+def sample_rows(size, sampleSize, rng):
+   ''' Indexes of sampleSize random individuals without repetition, all of them when there are not more '''
+   if (size <= sampleSize):
+      return numpy.arange(size)
+   return rng.choice(size, sampleSize, replace=False)
+
+
+def hamming_diversity(genes):
+   '''   Mean pairwise Hamming distance of a genes array divided by the chromosome size /
+            a symbol found c times in a column adds c (c - 1) / 2 equal pairs, the symbols of every column
+            are counted (column sums for 0/1 genes, one bincount for small integer alphabets),
+            no pair of individuals is compared
+   '''
+   size, chromosomeSize = genes.shape
+   if (size < 2 or chromosomeSize == 0):
+      return 0.0
+
+   counts = symbol_counts(genes)
+   equalPairs = (counts * (counts - 1) // 2).sum()
+   pairs = size * (size - 1) // 2 * chromosomeSize
+   return 1.0 - equalPairs.item() / pairs
+
+
+def symbol_counts(genes):
+   ''' Times every symbol is found in every column (zeros included), in no particular order '''
+   size, chromosomeSize = genes.shape
+   if (genes.dtype.kind in "biu"):
+      low, high = genes.min().item(), genes.max().item()
+      symbols = high - low + 1
+   if (genes.dtype.kind in "biu" and symbols <= 2):
+      ones = (genes != low).sum(axis=0)
+      return numpy.concatenate((ones, size - ones))
+   if (genes.dtype.kind in "biu" and symbols * chromosomeSize <= genes.size):
+      codes = (genes - low).astype(numpy.int64) + numpy.arange(chromosomeSize) * symbols
+      return numpy.bincount(codes.ravel(), minlength=symbols * chromosomeSize)
+
+   # Real genes or wide alphabets: the symbols are numbered first, then the (column, symbol) pairs counted
+   symbols, codes = numpy.unique(genes, return_inverse=True)
+   codes = codes.reshape(genes.shape) + numpy.arange(chromosomeSize) * len(symbols)
+   return numpy.unique(codes, return_counts=True)[1]
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# RUNNING AGGREGATES
+# ------------------------------------------------------------------------------------------------------------
+
+class RunningStatistics(object):
+   '''   Count, mean, variance, max and min of every value seen without keeping them,
+         every batch is merged with the Welford update (Chan et al. for batches)
+   '''
+
+   def __init__(self):
+      self.count = 0
+      self.mean = 0.0
+      self.squares = 0.0      # Sum of squared deviations from the mean
+      self.max = None
+      self.min = None
+
+   def update(self, values):
+      values = numpy.asarray(values, dtype=float).ravel()
+      if (len(values) == 0):
+         return
+      count = len(values)
+      mean = values.mean().item()
+      squares = numpy.square(values - mean).sum().item()
+
+      total = self.count + count
+      delta = mean - self.mean
+      self.mean += delta * count / total
+      self.squares += squares + delta ** 2 * self.count * count / total
+      self.count = total
+
+      self.max = values.max().item() if self.max is None else max(self.max, values.max().item())
+      self.min = values.min().item() if self.min is None else min(self.min, values.min().item())
+
+   def get_state(self):
+      ''' count, mean, squares, max and min as a float array, nan for no max and min, for checkpoints '''
+      return numpy.array([self.count, self.mean, self.squares,
+                          numpy.nan if self.max is None else self.max, numpy.nan if self.min is None else self.min])
+
+   def set_state(self, state):
+      count, self.mean, self.squares, maxValue, minValue = state.tolist()
+      self.count = int(count)
+      self.max = None if numpy.isnan(maxValue) else maxValue
+      self.min = None if numpy.isnan(minValue) else minValue
+
+   @property
+   def variance(self):
+      return self.squares / self.count if self.count else 0.0
+
+   def as_dict(self, prefix):
+      return {prefix + "Count": self.count, prefix + "Mean": self.mean, prefix + "Variance": self.variance,
+              prefix + "Max": self.max, prefix + "Min": self.min}
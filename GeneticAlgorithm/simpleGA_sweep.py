@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+
+'''
+title:            simpleGA_sweep
+description:      Hyperparameter sweep of simpleGA.Algorithm: every config of a grid or of a random search
+                  is run with every seed in a process pool, the results are one table (CSV)
+
+execution:        ./simpleGA_sweep.py spec.json --seeds 5 --workers 8 --time-budget 60 --output results.csv
+
+spec:             json file with
+                  base:                Config shared by every run, evaluationFunction as "module:function"
+                  grid:                {key: [values]}, every combination is a config
+                  random:              {key: [values] or ["uniform", low, high] or ["loguniform", low, high]
+                                       or ["integer", low, high]}, samples configs drawn at random
+                  samples:             Random configs, only with random
+
+results:          One row per config and seed: the swept keys, seed, the statistics of the last generation
+                  (generation, max, min, mean, variance, best, elapsed, stagnation, evaluations) and error,
+                  the message of the exception when the run failed
+'''
+
+import argparse
+import concurrent.futures
+import csv
+import importlib
+import itertools
+import json
+import math
+import sys
+
+import numpy
+
+import simpleGA
+
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# CONFIGS
+# ------------------------------------------------------------------------------------------------------------
+
+def grid_configs(grid):
+   ''' Every combination of the values of the grid, as a list of dicts '''
+   keys = list(grid)
+   return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def random_configs(space, samples, rng):
+   '''   samples configs drawn from space /
+            [values]: one of them, ["uniform", low, high], ["loguniform", low, high], ["integer", low, high]
+   '''
+   return [{key: random_value(domain, rng) for key, domain in space.items()} for sample in range(samples)]
+
+
+def random_value(domain, rng):
+   if (isinstance(domain, (list, tuple)) and len(domain) == 3 and domain[0] in ("uniform", "loguniform", "integer")):
+      distribution, low, high = domain
+      if (distribution == "uniform"):
+         return rng.uniform(low, high).item()
+      elif (distribution == "loguniform"):
+         return math.exp(rng.uniform(math.log(low), math.log(high)))
+      return rng.integers(low, high, endpoint=True).item()
+   return domain[rng.integers(len(domain))]
+
+
+def resolve_function(name):
+   ''' "module:function" to the function, so configs can be written in json and sent to processes '''
+   module, function = name.split(":")
+   return getattr(importlib.import_module(module), function)
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# RUN
+# ------------------------------------------------------------------------------------------------------------
+
+def budget_config(config, timeBudget):
+   ''' Adds a time stop of timeBudget seconds to the stop configuration, checked after every generation '''
+   if (not timeBudget):
+      return config
+   stopType, stopValue = config.get("stopType", "generation"), config.get("stopValue", 100)
+   if (not isinstance(stopType, (list, tuple))):
+      stopType, stopValue = [stopType], [stopValue]
+   return dict(config, stopType=list(stopType) + ["time"], stopValue=list(stopValue) + [timeBudget])
+
+
+def run_one(config, timeBudget):
+   ''' Statistics of the last generation of a run, error when it raised '''
+   statistics = dict()
+   ga = simpleGA.Algorithm(dict(budget_config(config, timeBudget), profile=True))
+   try:
+      for statistics in ga.iter_generations():
+         pass
+      error = ""
+   except Exception as exception:
+      error = repr(exception)
+   finally:
+      ga.close()
+
+   row = {key: statistics.get(key) for key in ("generation", "max", "min", "mean", "variance",
+                                               "best", "elapsed", "stagnation", "evaluations")}
+   row["error"] = error
+   return row
+
+
+def run_sweep(base, configs, seeds, timeBudget=None, workers=None):
+   '''   Runs every config with every seed in a process pool, returns one row per run in the order of
+         configs and seeds: the swept keys, seed and the run_one statistics
+   '''
+   jobs = [(config, seed) for config in configs for seed in seeds]
+   with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+      futures = [executor.submit(run_one, dict(base, seed=seed, **config), timeBudget) for config, seed in jobs]
+      rows = []
+      for (config, seed), future in zip(jobs, futures):
+         rows.append(dict(config, seed=seed, **future.result()))
+         print("{:>5}/{} {} seed={} best={}".format(len(rows), len(jobs), config, seed, rows[-1]["best"]),
+               file=sys.stderr)
+   return rows
+
+
+def write_csv(rows, path):
+   ''' Rows to a CSV file, columns in order of appearance '''
+   columns = list(dict.fromkeys(key for row in rows for key in row))
+   with open(path, "w", newline="") as output:
+      writer = csv.DictWriter(output, fieldnames=columns)
+      writer.writeheader()
+      writer.writerows(rows)
+
+
+def main():
+   parser = argparse.ArgumentParser(description="simpleGA hyperparameter sweep")
+   parser.add_argument("spec", help="json file with base and grid or random")
+   parser.add_argument("--seeds", type=int, default=3, help="runs of every config, seeds 0 .. seeds-1")
+   parser.add_argument("--workers", type=int, default=None, help="processes, one per cpu by default")
+   parser.add_argument("--time-budget", type=float, default=None, help="max seconds of every run")
+   parser.add_argument("--sample-seed", type=int, default=0, help="seed of the random search")
+   parser.add_argument("--output", default="sweep.csv", help="csv file with the results")
+   arguments = parser.parse_args()
+
+   with open(arguments.spec) as specFile:
+      spec = json.load(specFile)
+   base = dict(spec.get("base", {}))
+   if (isinstance(base.get("evaluationFunction"), str) and ":" in base["evaluationFunction"]):
+      base["evaluationFunction"] = resolve_function(base["evaluationFunction"])
+
+   if ("grid" in spec):
+      configs = grid_configs(spec["grid"])
+   elif ("random" in spec):
+      configs = random_configs(spec["random"], spec.get("samples", 10), numpy.random.default_rng(arguments.sample_seed))
+   else:
+      raise simpleGA.CustomException("spec needs grid or random")
+
+   rows = run_sweep(base, configs, range(arguments.seeds), arguments.time_budget, arguments.workers)
+   write_csv(rows, arguments.output)
+   print("{} runs written to {}".format(len(rows), arguments.output), file=sys.stderr)
+
+
+if __name__ == '__main__':
+   main()
@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+
+'''
+title:            simpleGA_telemetry
+description:      Buffered export of simpleGA records (statistics of every generation) to a JSONL or CSV file,
+                  a background thread writes them so the algorithm never waits for the disk
+
+records:          dicts, nested dicts are flattened for CSV (phases.crossover), lists are written as JSON,
+                  CSV columns are the given columns or the keys of the first record, later keys that are
+                  not a column are left out and counted in TelemetryWriter.droppedColumns
+queue:            bounded, a record that does not fit is dropped and counted in TelemetryWriter.dropped
+'''
+
+import atexit
+import collections
+import csv
+import json
+import queue
+import threading
+import time
+
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# RECORDS
+# ------------------------------------------------------------------------------------------------------------
+
+def flatten_record(record, prefix=""):
+   ''' Nested dicts to one level, keys joined by dots, lists and tuples as JSON text '''
+   flat = dict()
+   for key, value in record.items():
+      if (isinstance(value, dict)):
+         flat.update(flatten_record(value, prefix + key + "."))
+      elif (isinstance(value, (list, tuple))):
+         flat[prefix + key] = json.dumps(value)
+      else:
+         flat[prefix + key] = value
+   return flat
+
+
+# ------------------------------------------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------------------------------------------
+# WRITER
+# ------------------------------------------------------------------------------------------------------------
+
+class TelemetryWriter(object):
+   '''   Writes records to path in a background thread /
+            telemetryFormat E {jsonl, csv}
+            flushInterval: seconds between flushes of the file
+            queueSize: records waiting to be written, more are dropped
+            columns: CSV columns (flattened keys), None: the keys of the first record
+   '''
+
+   # Sent through the queue to stop the thread
+   stopRecord = object()
+
+   def __init__(self, path, telemetryFormat="jsonl", flushInterval=1.0, queueSize=10000, columns=None):
+      if (telemetryFormat not in ("jsonl", "csv")):
+         raise ValueError("telemetryFormat not implemented")
+      self.path = path
+      self.telemetryFormat = telemetryFormat
+      self.flushInterval = flushInterval
+      self.records = queue.Queue(maxsize=queueSize)
+      self.dropped = 0
+      self.written = 0
+      self.columns = None if columns is None else list(columns)
+      self.droppedColumns = collections.Counter()    # key: records written without it
+
+      self.file = open(path, "w", newline="")
+      self.csvWriter = None
+      self.columnSet = set()
+      self.thread = threading.Thread(target=self.write_loop, name="simpleGA-telemetry", daemon=True)
+      self.thread.start()
+      atexit.register(self.close)
+
+   def write(self, record):
+      ''' Queues a record without waiting, it is dropped when the queue is full '''
+      try:
+         self.records.put_nowait(record)
+      except queue.Full:
+         self.dropped += 1
+
+   def write_loop(self):
+      ''' Writes every queued record, the file is flushed every flushInterval seconds and at the end '''
+      lastFlush = time.monotonic()
+      while True:
+         try:
+            record = self.records.get(timeout=self.flushInterval)
+         except queue.Empty:
+            record = None
+         if (record is self.stopRecord):
+            self.file.flush()
+            return
+         if (record is not None):
+            self.write_record(record)
+
+         if (time.monotonic() - lastFlush >= self.flushInterval):
+            self.file.flush()
+            lastFlush = time.monotonic()
+
+   def write_record(self, record):
+      if (self.telemetryFormat == "jsonl"):
+         self.file.write(json.dumps(record, default=str) + "\n")
+      else:
+         record = flatten_record(record)
+         if (self.csvWriter is None):
+            self.columns = self.columns or list(record)
+            self.csvWriter = csv.DictWriter(self.file, fieldnames=self.columns, extrasaction="ignore")
+            self.csvWriter.writeheader()
+            self.columnSet = set(self.columns)
+         self.droppedColumns.update(key for key in record if key not in self.columnSet)
+         self.csvWriter.writerow(record)
+      self.written += 1
+
+   def close(self):
+      ''' Writes the records still queued and closes the file '''
+      if (self.file.closed):
+         return
+      self.records.put(self.stopRecord)
+      self.thread.join()
+      self.file.close()
+      atexit.unregister(self.close)
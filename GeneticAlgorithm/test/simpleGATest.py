@@ -0,0 +1,288 @@
+import unittest
+import logging
+import itertools
+import os
+import tempfile
+import numpy
+import simpleGA
+
+
+class RouletteTestCase(unittest.TestCase):
+
+   def test_roulette_table(self):
+      self.assertEqual([1, 3, 6], simpleGA.roulette_table([1, 2, 3]))
+      self.assertEqual([2, 2, 6], simpleGA.roulette_table([1, -1, 3]))
+      self.assertEqual([1, 2, 3], simpleGA.roulette_table([0, 0, 0]))
+      self.assertEqual([1, 2, 3], simpleGA.roulette_table([-2, -2, -2]))
+      self.assertEqual([2.0, 2.0, 6.0], simpleGA.roulette_table_array(numpy.array([1.0, -1.0, 3.0])).tolist())
+      self.assertEqual([1.0, 2.0, 3.0], simpleGA.roulette_table_array(numpy.zeros(3)).tolist())
+
+   def test_negative_fitness(self):
+      ''' The lowest fitness is shifted to 0 and never drawn, the rest in proportion '''
+      rng = numpy.random.default_rng(0)
+      counts = numpy.bincount(simpleGA.selection_roulette_array(numpy.array([-1.0, -2.0, 5.0, 0.0]), 20000, rng),
+                              minlength=4)
+      self.assertEqual(0, counts[1])
+      numpy.testing.assert_allclose(counts / 20000, [0.1, 0.0, 0.7, 0.2], atol=0.02)
+
+      population = [{"chromosome": [i], "fitness": value} for i, value in enumerate([-1, -2, 5, 0])]
+      chosen = itertools.islice(simpleGA.selection_roulette(population, rng=rng), 5000)
+      self.assertNotIn(1, [individual["chromosome"][0] for individual in chosen])
+
+   def test_zero_fitness(self):
+      ''' Every individual is drawn with the same probability '''
+      rng = numpy.random.default_rng(1)
+      counts = numpy.bincount(simpleGA.selection_roulette_array(numpy.zeros(4), 20000, rng), minlength=4)
+      numpy.testing.assert_allclose(counts / 20000, [0.25] * 4, atol=0.02)
+
+      population = [{"chromosome": [i], "fitness": 0} for i in range(4)]
+      chosen = [individual["chromosome"][0]
+                for individual in itertools.islice(simpleGA.selection_roulette(population, rng=rng), 20000)]
+      numpy.testing.assert_allclose(numpy.bincount(chosen, minlength=4) / 20000, [0.25] * 4, atol=0.02)
+
+
+class CacheTestCase(unittest.TestCase):
+
+   def setUp(self):
+      self.evaluated = []
+
+   def fitness_batch(self, chromosomes):
+      self.evaluated.extend(chromosomes.tolist())
+      return chromosomes.sum(axis=1)
+
+   def test_hits_and_misses(self):
+      cache = simpleGA.FitnessCache(10)
+      genes = numpy.array([[1, 2], [3, 4], [1, 2], [5, 6]])
+      fitness = simpleGA.evaluation_cached_array(genes, cache, evaluationType="batch",
+                                                 evaluationFunction=self.fitness_batch, geneType='Z', geneChoice="")
+      self.assertEqual([3, 7, 3, 11], fitness.tolist())
+      self.assertEqual([[1, 2], [3, 4], [5, 6]], self.evaluated)
+      self.assertEqual((1, 3), (cache.hits, cache.misses))
+
+      fitness = simpleGA.evaluation_cached_array(genes[:2], cache, evaluationType="batch",
+                                                 evaluationFunction=self.fitness_batch, geneType='Z', geneChoice="")
+      self.assertEqual([3, 7], fitness.tolist())
+      self.assertEqual(3, len(self.evaluated))
+      self.assertEqual((3, 3), (cache.hits, cache.misses))
+
+   def test_dict_population(self):
+      cache = simpleGA.FitnessCache(10)
+      population = [{"chromosome": chromosome, "fitness": 0} for chromosome in ([1, 2], [3, 4], [1, 2])]
+      simpleGA.evaluation_cached(population, cache, evaluationType="batch", evaluationFunction=self.fitness_batch,
+                                 chromosomeMin=2, chromosomeMax=2)
+      self.assertEqual([3, 7, 3], [individual["fitness"] for individual in population])
+      self.assertEqual(2, len(self.evaluated))
+      self.assertEqual((1, 2), (cache.hits, cache.misses))
+
+   def test_least_recently_used(self):
+      cache = simpleGA.FitnessCache(2)
+      cache.put("a", 1.0)
+      cache.put("b", 2.0)
+      self.assertEqual(1.0, cache.get("a"))
+      cache.put("c", 3.0)
+      self.assertEqual(None, cache.get("b"))
+      self.assertEqual(1.0, cache.get("a"))
+      self.assertEqual((2, 1), (cache.hits, cache.misses))
+
+   def test_algorithm_statistics(self):
+      ga = simpleGA.Algorithm({"engine": "array", "geneMin": 0, "geneMax": 1, "chromosomeMin": 3, "chromosomeMax": 3,
+                               "populationMin": 20, "populationMax": 20, "evaluationType": "test", "cacheSize": 100,
+                               "seed": 0})
+      ga.initialize()
+      for generation in range(10):
+         ga.step()
+      statistics = ga.get_statistics()
+      self.assertLessEqual(statistics["cacheMisses"], 8)
+      self.assertEqual(ga.evaluations, statistics["cacheHits"] + statistics["cacheMisses"])
+
+
+class StopTestCase(unittest.TestCase):
+
+   def statistics(self, **values):
+      return dict({"generation": 1, "best": 0.0, "elapsed": 0.0, "stagnation": 0}, **values)
+
+   def test_stop_criteria(self):
+      self.assertFalse(simpleGA.stop(self.statistics(generation=9), "generation", 10))
+      self.assertTrue(simpleGA.stop(self.statistics(generation=10), "generation", 10))
+      self.assertFalse(simpleGA.stop(self.statistics(best=4.5), "fitness", 5))
+      self.assertTrue(simpleGA.stop(self.statistics(best=5.0), "fitness", 5))
+      self.assertFalse(simpleGA.stop(self.statistics(elapsed=0.9), "time", 1.0))
+      self.assertTrue(simpleGA.stop(self.statistics(elapsed=1.0), "time", 1.0))
+      self.assertFalse(simpleGA.stop(self.statistics(stagnation=2), "stagnation", 3))
+      self.assertTrue(simpleGA.stop(self.statistics(stagnation=3), "stagnation", 3))
+      self.assertTrue(simpleGA.stop(self.statistics(generation=2, best=7.0), ["generation", "fitness"], [100, 7]))
+      self.assertFalse(simpleGA.stop(self.statistics(generation=2, best=6.0), ["generation", "fitness"], [100, 7]))
+      with self.assertRaises(simpleGA.CustomException):
+         simpleGA.stop(self.statistics(), "never", 1)
+
+   def run_until(self, stopType, stopValue):
+      ga = simpleGA.Algorithm({"engine": "array", "evaluationType": "test", "seed": 2,
+                               "stopType": stopType, "stopValue": stopValue})
+      return ga, list(ga.iter_generations())
+
+   def test_generation(self):
+      ga, generations = self.run_until("generation", 7)
+      self.assertEqual(list(range(1, 8)), [statistics["generation"] for statistics in generations])
+
+   def test_fitness(self):
+      ga, generations = self.run_until(["fitness", "generation"], [500, 1000])
+      self.assertGreaterEqual(generations[-1]["best"], 500)
+      self.assertTrue(all(statistics["best"] < 500 for statistics in generations[:-1]))
+
+   def test_stagnation(self):
+      ga, generations = self.run_until(["stagnation", "generation"], [3, 1000])
+      self.assertEqual(3, generations[-1]["stagnation"])
+      self.assertEqual([0, 1, 2, 3], [statistics["stagnation"] for statistics in generations[-4:]])
+      self.assertLess(generations[-1]["generation"], 1000)
+
+   def test_time(self):
+      ga, generations = self.run_until("time", 0.05)
+      self.assertGreaterEqual(generations[-1]["elapsed"], 0.05)
+      self.assertTrue(all(statistics["elapsed"] < 0.05 for statistics in generations[:-1]))
+
+   def test_best_individual(self):
+      ga, generations = self.run_until("generation", 5)
+      self.assertEqual(max(statistics["best"] for statistics in generations), ga.get_bestIndividual()["fitness"])
+
+
+class RaggedTestCase(unittest.TestCase):
+
+   chromosomeMin = 2
+   chromosomeMax = 9
+
+   def random_population(self, rng, size=40):
+      ''' Every gene is different, so the genes of a child tell where they come from '''
+      offsets = simpleGA.ragged_offsets(rng.integers(self.chromosomeMin, self.chromosomeMax, size, endpoint=True))
+      return numpy.arange(offsets[-1]), offsets
+
+   def check_children(self, genes, offsets, pairs, childGenes, childOffsets):
+      lengths = numpy.diff(childOffsets)
+      self.assertEqual(2 * len(pairs), len(lengths))
+      self.assertTrue((lengths >= self.chromosomeMin).all())
+      self.assertTrue((lengths <= self.chromosomeMax).all())
+      for i, (a, b) in enumerate(pairs):
+         parents = numpy.concatenate((genes[offsets[a]:offsets[a + 1]], genes[offsets[b]:offsets[b + 1]]))
+         children = childGenes[childOffsets[2 * i]:childOffsets[2 * i + 2]]
+         self.assertEqual(sorted(parents.tolist()), sorted(children.tolist()))
+
+   def test_ragged_indexes(self):
+      self.assertEqual([5, 6, 0, 1, 2], simpleGA.ragged_indexes(numpy.array([5, 0]), numpy.array([2, 3])).tolist())
+      self.assertEqual([3, 7, 8], simpleGA.ragged_indexes(numpy.array([3, 1, 7]), numpy.array([1, 0, 2])).tolist())
+      self.assertEqual([], simpleGA.ragged_indexes(numpy.array([], dtype=int), numpy.array([], dtype=int)).tolist())
+
+   def test_ragged_take(self):
+      genes = numpy.arange(10)
+      offsets = simpleGA.ragged_offsets([3, 0, 2, 5])
+      takenGenes, takenOffsets = simpleGA.ragged_take(genes, offsets, numpy.array([3, 1, 0]))
+      self.assertEqual([5, 6, 7, 8, 9, 0, 1, 2], takenGenes.tolist())
+      self.assertEqual([0, 5, 5, 8], takenOffsets.tolist())
+
+   def test_crossover_pairs_ragged(self):
+      rng = numpy.random.default_rng(0)
+      for crossoverType in ('onepoint', 'twopoint', 'uniform'):
+         for repetition in range(20):
+            genes, offsets = self.random_population(rng)
+            pairs = rng.integers(0, len(offsets) - 1, (30, 2))
+            childGenes, childOffsets = simpleGA.crossover_pairs_ragged(
+               genes, offsets, pairs, crossoverType, self.chromosomeMin, self.chromosomeMax, rng)
+            self.check_children(genes, offsets, pairs, childGenes, childOffsets)
+
+   def test_crossover_uniform_ragged(self):
+      rng = numpy.random.default_rng(1)
+      genes, offsets = self.random_population(rng)
+      pairs = rng.integers(0, len(offsets) - 1, (30, 2))
+      starts = offsets[pairs]
+      lengths = offsets[pairs + 1] - starts
+      childGenes, childOffsets = simpleGA.crossover_uniform_ragged(
+         genes, starts[:, 0], starts[:, 1], lengths[:, 0], lengths[:, 1], rng)
+      self.assertEqual(lengths.ravel().tolist(), numpy.diff(childOffsets).tolist())
+      self.check_children(genes, offsets, pairs, childGenes, childOffsets)
+
+
+class SteadyStateTestCase(unittest.TestCase):
+
+   def algorithm(self, engine):
+      return simpleGA.Algorithm({"engine": engine, "chromosomeMin": 8, "chromosomeMax": 8,
+                                 "reductionType": "steadyState", "crossoverMin": 2, "crossoverMax": 4,
+                                 "evaluationType": "test", "seed": 5})
+
+   def test_best_is_kept(self):
+      for engine in ("dict", "array", "packed", "ragged"):
+         ga = self.algorithm(engine)
+         ga.initialize()
+         best = ga.get_statistics()["max"]
+         for generation in range(40):
+            ga.step()
+            ga.get_population()
+            self.assertGreaterEqual(ga.get_statistics()["max"], best)
+            best = ga.get_statistics()["max"]
+
+   def test_reordered_population(self):
+      ''' The heap is rebuilt when the population is reordered between generations '''
+      ga = self.algorithm("array")
+      ga.initialize()
+      rng = numpy.random.default_rng(0)
+      best = ga.get_statistics()["max"]
+      for generation in range(40):
+         ga.step()
+         order = rng.permutation(len(ga.fitness))
+         ga.genes[:], ga.fitness[:] = ga.genes[order], ga.fitness[order]
+         self.assertGreaterEqual(ga.get_statistics()["max"], best)
+         best = ga.get_statistics()["max"]
+
+   def test_get_population_does_not_change_the_run(self):
+      for engine in ("dict", "array", "ragged"):
+         runs = []
+         for peek in (False, True):
+            ga = self.algorithm(engine)
+            ga.initialize()
+            for generation in range(20):
+               ga.step()
+               if (peek):
+                  ga.get_population()
+            runs.append(ga.get_population())
+         self.assertEqual(runs[0], runs[1])
+
+
+class CheckpointTestCase(unittest.TestCase):
+
+   def resume(self, config, before=5, after=5):
+      ''' Population of an uninterrupted run and of a run resumed from a checkpoint, after the same steps '''
+      original = simpleGA.Algorithm(config)
+      original.initialize()
+      for generation in range(before):
+         original.step()
+      with tempfile.TemporaryDirectory() as directory:
+         path = os.path.join(directory, "checkpoint.npz")
+         original.save_checkpoint(path)
+         resumed = simpleGA.Algorithm(config)
+         resumed.load_checkpoint(path)
+      for generation in range(after):
+         original.step()
+         resumed.step()
+      self.assertEqual(original.generationNumber, resumed.generationNumber)
+      self.assertEqual(original.get_bestIndividual(), resumed.get_bestIndividual())
+      return original.get_population(), resumed.get_population()
+
+   def test_resume(self):
+      for engine in ("dict", "array", "packed", "ragged"):
+         for reductionType in ("survivalChildren", "roulette", "steadyState"):
+            config = {"engine": engine, "reductionType": reductionType, "chromosomeMin": 4, "chromosomeMax": 8,
+                      "populationMin": 6, "populationMax": 10, "crossoverMin": 2, "crossoverMax": 4,
+                      "evaluationType": "test", "seed": 11}
+            original, resumed = self.resume(config)
+            self.assertEqual(original, resumed, (engine, reductionType))
+
+   def test_resume_surrogate(self):
+      for engine in ("array", "packed"):
+         for surrogateType in ("knn", "linear"):
+            config = {"engine": engine, "surrogateType": surrogateType, "surrogateMin": 5,
+                      "crossoverMin": 4, "crossoverMax": 4, "geneMax": 1 if engine == "packed" else 9,
+                      "evaluationType": "test", "seed": 3}
+            original, resumed = self.resume(config)
+            self.assertEqual(original, resumed, (engine, surrogateType))
+
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s: %(levelname)-8s > %(message)s", datefmt="%I:%M:%S")
+if __name__ == '__main__':
+   unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import logging
+import numpy
+import simpleGA_nsga2
+
+
+def brute_ranks(objectives):
+   ''' Front of every individual by peeling the non dominated ones, one comparison at a time '''
+   def dominates(a, b):
+      return all(x >= y for x, y in zip(a, b)) and any(x > y for x, y in zip(a, b))
+
+   ranks = [-1] * len(objectives)
+   rank = 0
+   while (-1 in ranks):
+      left = [i for i in range(len(objectives)) if ranks[i] == -1]
+      front = [i for i in left if not any(dominates(objectives[j], objectives[i]) for j in left)]
+      for i in front:
+         ranks[i] = rank
+      rank += 1
+   return ranks
+
+
+def brute_crowding(objectives, ranks):
+   ''' Crowding distance of every front computed on its own, as in the NSGA-II paper '''
+   distance = [0.0] * len(objectives)
+   for rank in set(ranks):
+      front = [i for i in range(len(objectives)) if ranks[i] == rank]
+      for objective in range(len(objectives[0])):
+         ordered = sorted(front, key=lambda i: objectives[i][objective])
+         low, high = objectives[ordered[0]][objective], objectives[ordered[-1]][objective]
+         distance[ordered[0]] = distance[ordered[-1]] = float("inf")
+         for k in range(1, len(ordered) - 1):
+            if (high > low):
+               distance[ordered[k]] += (objectives[ordered[k + 1]][objective] -
+                                        objectives[ordered[k - 1]][objective]) / (high - low)
+   return distance
+
+
+class ParetoTestCase(unittest.TestCase):
+
+   def random_objectives(self, rng):
+      ''' Few distinct values so there are ties and many fronts '''
+      return rng.integers(0, 6, (rng.integers(1, 40), rng.integers(1, 4))).astype(float)
+
+   def test_non_dominated_sort(self):
+      rng = numpy.random.default_rng(0)
+      for repetition in range(50):
+         objectives = self.random_objectives(rng)
+         self.assertEqual(brute_ranks(objectives.tolist()), simpleGA_nsga2.non_dominated_sort(objectives).tolist())
+
+   def test_crowding_distance(self):
+      rng = numpy.random.default_rng(1)
+      for repetition in range(50):
+         # Distinct values: with ties the neighbours of an individual depend on the sort
+         size = rng.integers(1, 40)
+         objectives = numpy.column_stack([rng.permutation(100)[:size] for objective in range(3)]).astype(float)
+         ranks = simpleGA_nsga2.non_dominated_sort(objectives)
+         expected = brute_crowding(objectives.tolist(), ranks.tolist())
+         numpy.testing.assert_allclose(expected, simpleGA_nsga2.crowding_distance(objectives, ranks))
+
+   def test_single_front(self):
+      objectives = numpy.array([[0.0, 3.0], [1.0, 2.0], [2.0, 1.0], [3.0, 0.0]])
+      ranks = simpleGA_nsga2.non_dominated_sort(objectives)
+      self.assertEqual([0, 0, 0, 0], ranks.tolist())
+      self.assertEqual([numpy.inf, 4 / 3, 4 / 3, numpy.inf],
+                       simpleGA_nsga2.crowding_distance(objectives, ranks).tolist())
+
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s: %(levelname)-8s > %(message)s", datefmt="%I:%M:%S")
+if __name__ == '__main__':
+   unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import logging
+import itertools
+import numpy
+import simpleGA_statistics
+
+
+def brute_diversity(genes):
+   ''' Mean over every pair of rows of the fraction of genes that differ '''
+   pairs = list(itertools.combinations(range(len(genes)), 2))
+   return sum((genes[i] != genes[j]).mean() for i, j in pairs) / len(pairs)
+
+
+class StatisticsTestCase(unittest.TestCase):
+
+   def test_hamming_diversity(self):
+      rng = numpy.random.default_rng(0)
+      samples = [rng.integers(0, 2, (30, 17)).astype(numpy.uint8),     # column sums
+                 rng.integers(3, 9, (30, 17)),                         # bincount
+                 rng.integers(0, 10 ** 6, (30, 17)),                   # wide alphabet
+                 rng.integers(0, 3, (30, 17)) / 2.0,                   # real genes
+                 rng.random((30, 17)) < 0.3,
+                 numpy.full((30, 17), 4)]
+      for genes in samples:
+         self.assertAlmostEqual(brute_diversity(genes), simpleGA_statistics.hamming_diversity(genes))
+      self.assertEqual(0.0, simpleGA_statistics.hamming_diversity(samples[0][:1]))
+
+   def test_running_statistics(self):
+      rng = numpy.random.default_rng(1)
+      values = rng.normal(size=100)
+      running = simpleGA_statistics.RunningStatistics()
+      for batch in numpy.array_split(values, 7):
+         running.update(batch)
+      self.assertAlmostEqual(values.mean(), running.mean)
+      self.assertAlmostEqual(values.var(), running.variance)
+
+      restored = simpleGA_statistics.RunningStatistics()
+      restored.set_state(running.get_state())
+      self.assertEqual(running.as_dict("evaluated"), restored.as_dict("evaluated"))
+      empty = simpleGA_statistics.RunningStatistics()
+      empty.set_state(simpleGA_statistics.RunningStatistics().get_state())
+      self.assertEqual(None, empty.max)
+
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s: %(levelname)-8s > %(message)s", datefmt="%I:%M:%S")
+if __name__ == '__main__':
+   unittest.main()